@@ -1,38 +1,61 @@
 """The Lorex integration."""
 
-from _collections_abc import Callable
+from _collections_abc import Callable, Iterable
 import asyncio
 from datetime import timedelta
 import logging
+import random
 import sys
-from threading import Timer
+import time
 from typing import Any
 
 from homeassistant.components.generic.const import CONF_STREAM_SOURCE
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, EVENT_HOMEASSISTANT_STOP
 from homeassistant.core_config import Config, HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
 
 from .const import (
     ALARMLOCAL,
+    CONF_HOLD_TIME,
     CONF_NAME,
+    CONNECT_TIMEOUT,
     CONF_PASSWORD,
     CONF_USERNAME,
     CONF_PORT,
+    DAHUA_DEVICE_TYPE,
+    DAHUA_SERIAL_NUMBER,
+    DEFAULT_HOLD_TIME,
     DOMAIN,
     INTELLIFRAME,
     LOREX_CLIENT,
     LOREX_CONNECTION,
+    LOREX_DOORBELL_CODES,
     LOREX_GETTING_EVENTS,
     LOREX_ID,
     LOREX_MODEL,
+    LOREX_RECEIVED,
     LOREX_TIME_STAMP,
     PLATFORMS,
+    RECONNECT_MAX_DELAY,
+    RECONNECT_MIN_DELAY,
+    SETUP_TIMEOUT,
     STARTUP_MESSAGE,
+    STORAGE_KEY,
+    STORAGE_VERSION,
     VIDEOMOTION,
 )
-from .lorex_doorbell_client import LorexDoorbellClient
+from .connection_manager import get_connection_manager
+from .lorex_doorbell_client import (
+    DeviceClock,
+    EventHistory,
+    FrameRecorder,
+    LorexDoorbellClient,
+    ProtocolMetrics,
+)
 
 SCAN_INTERVAL_SECONDS = timedelta(seconds=30)
 
@@ -59,30 +82,59 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry,
     )
 
-    # Wait on connection before configuring entities
-    await lorex_coor.is_connected()
+    # Entities can be created straight away from a saved identity, otherwise
+    # wait on connection before configuring entities
+    if not await lorex_coor.async_start() and not await lorex_coor.is_connected(
+        SETUP_TIMEOUT
+    ):
+        await lorex_coor.async_stop(None)
+        raise ConfigEntryNotReady(f"Timed out connecting to {lorex_coor.host}")
 
     hass.data[DOMAIN][entry.entry_id] = lorex_coor
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # subscribe once to the codes of all the entities just added
+    lorex_coor.entities_ready()
     # ensure we stop threads when home assistant stops
     entry.async_on_unload(
         hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, lorex_coor.async_stop)
     )
+    # options are read when the coordinator starts, reload when they change
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unloaded = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unloaded:
+        lorex_coor: LorexCoordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await lorex_coor.async_stop(None)
+    return unloaded
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry after the options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the saved device identity with the config entry."""
+    await identity_store(hass, entry).async_remove()
+
+
+def identity_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Return the store holding the device identity for a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}")
 
 
 class LorexCoordinator:
     """Manage overall communication with device."""
 
     data: dict[str, Any]
-    entity_callbacks: dict[str, Callable]
+    entity_callbacks: dict[Callable, frozenset[str]]
+    event_code_users: dict[Any, frozenset[str]]
 
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
         """Initialise coordinator."""
@@ -94,15 +146,38 @@ class LorexCoordinator:
         self.password = entry.data[CONF_PASSWORD]
         self.name = entry.data[CONF_NAME]
         self.port = entry.data[CONF_PORT]  # 5000
+        self.hold_time = entry.options.get(CONF_HOLD_TIME, DEFAULT_HOLD_TIME)
+        # protocol counters, kept across reconnects
+        self.metrics = ProtocolMetrics()
+        # last frames sent and received, for the diagnostics download
+        self.recorder = FrameRecorder()
+        # recent events and their statistics, for the statistics sensors
+        self.history = EventHistory()
+        # doorbell clock against ours, kept across reconnects
+        self.clock = DeviceClock(self._utc_offset)
         self.rtsp_port = 554
         self._deviceType = "doorbell"
         self._entry = entry
-        self._failed_connection = False
         self._connected = False
+        # set once logged in and the device details are loaded
+        self._ready = asyncio.Event()
         self._hass_closing = False
-        self.reconnect_interval = 60
+        self._reconnect_attempt = 0
+        self._reconnect_now = False
+        self._reconnect_call = None
+        self._connection_task: asyncio.Task | None = None
+        self.manager = get_connection_manager(hass)
+        self.client: LorexDoorbellClient | None = None
+        self.dahua_details: dict[str, Any] = {}
+        self._store = identity_store(hass, entry)
         # self._dahua_event_listeners: dict[str, CALLBACK_TYPE] = dict()
-        self.entity_callbacks = set()
+        self.entity_callbacks = {}
+        # polled entities reading the event history, they need no callback
+        self.event_code_users = {}
+        # event codes are subscribed once the platforms are set up, changes
+        # after that are sent once per loop iteration
+        self._entities_ready = False
+        self._event_codes_call: asyncio.Handle | None = None
         self.data = {}
         self.data[LOREX_CONNECTION] = False
         self.data[INTELLIFRAME] = False
@@ -112,41 +187,165 @@ class LorexCoordinator:
         self.data[LOREX_ID] = ""
         self.data[LOREX_TIME_STAMP] = ""
 
+    async def async_start(self) -> bool:
+        """Load the saved device identity and start the connection.
+
+        Return True if a saved identity was found so entities can be created
+        before the doorbell has connected.
+        """
+        cached = await self._store.async_load()
+        if cached and cached.get(DAHUA_SERIAL_NUMBER):
+            self.dahua_details = cached
+            self.data[LOREX_ID] = cached[DAHUA_SERIAL_NUMBER]
+            self.data[LOREX_MODEL] = cached.get(DAHUA_DEVICE_TYPE) or ""
+
         # last thing is to start the doorbell and start recieving events from the device
-        asyncio.run_coroutine_threadsafe(self.run_doorbell(), self.hass.loop)
+        self.manager.add(self._entry.entry_id, self)
+        # a new entry continues the session the config flow logged in with
+        self.connect(self.manager.take_over(self._entry.unique_id))
+        return bool(self.dahua_details)
+
+    def _confirm_identity(self, details: dict[str, Any]):
+        """Compare the details loaded after login with the saved identity.
+
+        A different serial number means a different device is at this
+        address, drop the saved identity and set the entry up again.
+        """
+        if details == self.dahua_details:
+            return
+
+        saved_serial = self.dahua_details.get(DAHUA_SERIAL_NUMBER)
+        self.dahua_details = dict(details)
+        if saved_serial and saved_serial != details.get(DAHUA_SERIAL_NUMBER):
+            _LOGGER.warning(
+                "Serial number of %s changed from %s, reloading",
+                self.host,
+                saved_serial,
+            )
+            self.hass.async_create_task(self._async_invalidate_identity())
+            return
+
+        self._store.async_delay_save(lambda: self.dahua_details, 1)
+
+    async def _async_invalidate_identity(self):
+        """Remove the saved identity and reload the config entry."""
+        await self._store.async_remove()
+        self.hass.config_entries.async_schedule_reload(self._entry.entry_id)
 
     def on_event(self, event: dict[str, Any]):
         """Recieve callback from doorbell device."""
+        previous = self.data
         self.data = event.copy()
-        if event[LOREX_CONNECTION] and not event[LOREX_GETTING_EVENTS]:
-            event[LOREX_CLIENT].attach_event_manager()
+        if (
+            event[LOREX_CONNECTION]
+            and not event[LOREX_GETTING_EVENTS]
+            and self._entities_ready
+        ):
+            event[LOREX_CLIENT].attach_event_manager(self.event_codes())
         self._connected = event[LOREX_CONNECTION]
-        # if something has changed call the approriate callback
-        for cb in self.entity_callbacks:
-            cb()
-        _LOGGER.debug("Event received from API: %s", self.data)
-        # if the connection has closed.  try connect again after interval
-        if not self._connected and not self._hass_closing:
-            Timer(self.reconnect_interval, self.reconnect).start()
+        if self._connected:
+            # logged in, the next disconnect starts the backoff from scratch
+            self._reconnect_attempt = 0
+            if event[LOREX_CLIENT] is not None and not self._ready.is_set():
+                self._confirm_identity(event[LOREX_CLIENT].dahua_details)
+                self._ready.set()
+        else:
+            self._ready.clear()
+        # only call back the entities using a key that has changed
+        changed = {
+            key for key, value in self.data.items() if previous.get(key) != value
+        }
+        if changed:
+            called = False
+            for cb, keys in list(self.entity_callbacks.items()):
+                if not keys.isdisjoint(changed):
+                    cb()
+                    called = True
+            if called and LOREX_RECEIVED in changed:
+                # a doorbell event, the entities have written their state
+                self.metrics.write_latency.add(
+                    time.monotonic() - self.data[LOREX_RECEIVED]
+                )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Event received from API: %s", self.data)
         return True
 
+    @staticmethod
+    def _utc_offset() -> float:
+        """Seconds the Home Assistant time zone is ahead of UTC."""
+        return dt_util.now().utcoffset().total_seconds()
+
     async def async_stop(self, event: Any):
         """Stop seperate thread.
 
         remove callbacks and close the connection.
         """
-        self._failed_connection = True
         self._hass_closing = True
-        self.data[LOREX_CLIENT].close_connection()
-
-    def add_callback(self, to_call: Callable[[], None]):
-        """Add call back from entity."""
+        if self._event_codes_call is not None:
+            self._event_codes_call.cancel()
+            self._event_codes_call = None
+        if self._reconnect_call is not None:
+            self._reconnect_call.cancel()
+            self._reconnect_call = None
+        if self.client is not None:
+            self.client.close_connection()
+        self.manager.remove(self._entry.entry_id)
+
+    def add_callback(self, to_call: Callable[[], None], keys: Iterable[str] = ()):
+        """Add call back from entity.
+
+        keys are the data keys the entity uses, it is only called back when
+        one of them changes. Event codes among the keys are requested from
+        the doorbell.
+        """
         if to_call is not None:
-            self.entity_callbacks.add(to_call)
+            self.entity_callbacks[to_call] = frozenset(keys)
+            self._update_event_codes()
 
     def remove_callback(self, to_call: Callable[[], None]):
         """Remove entity callback."""
-        self.entity_callbacks.discard(to_call)
+        if self.entity_callbacks.pop(to_call, None) is not None:
+            self._update_event_codes()
+
+    def add_event_codes(self, user: Any, codes: Iterable[str]):
+        """Request event codes from the doorbell for an entity that polls."""
+        self.event_code_users[user] = frozenset(codes)
+        self._update_event_codes()
+
+    def remove_event_codes(self, user: Any):
+        """Remove the event codes requested by add_event_codes."""
+        if self.event_code_users.pop(user, None) is not None:
+            self._update_event_codes()
+
+    def event_codes(self) -> set[str]:
+        """Return the event codes used by the registered entities."""
+        codes = set()
+        for keys in self.entity_callbacks.values():
+            codes |= keys
+        for keys in self.event_code_users.values():
+            codes |= keys
+        return codes & set(LOREX_DOORBELL_CODES)
+
+    def entities_ready(self):
+        """Platforms are set up, subscribe to the codes their entities use."""
+        self._entities_ready = True
+        self._update_event_codes()
+
+    def _update_event_codes(self):
+        """Subscribe the doorbell to the event codes now in use.
+
+        Entities added or enabled together cause a single subscription.
+        """
+        if self._entities_ready and self._event_codes_call is None:
+            self._event_codes_call = self.hass.loop.call_soon(
+                self._subscribe_event_codes
+            )
+
+    def _subscribe_event_codes(self):
+        """Send the event codes now in use to a logged in doorbell."""
+        self._event_codes_call = None
+        if self.client is not None and self.client.status[LOREX_CONNECTION]:
+            self.client.attach_event_manager(self.event_codes())
 
     def camera_device_info(self):
         """Return camera information."""
@@ -164,34 +363,83 @@ class LorexCoordinator:
             f"rtsp://{self.host}:{self.rtsp_port}/cam/realmonitor?channel=1&subtype=1"
         )
 
-    async def is_connected(self):
-        """Connect state."""
-        while not self._connected and not self._failed_connection:
-            await asyncio.sleep(0.2)
+    async def is_connected(self, timeout: float = SETUP_TIMEOUT) -> bool:
+        """Wait until the doorbell is logged in and identified.
+
+        Return False if that does not happen within timeout seconds.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
         _LOGGER.info("Doorbell connected")
-        return self._connected
+        return True
 
     async def _async_update_data(self):
         """Not needed?."""
-        try:
-            if not self.data[LOREX_CONNECTION]:
-                await self.is_connected()
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with API: {err}") from err
+        if not self.data[LOREX_CONNECTION] and not await self.is_connected():
+            raise UpdateFailed("Error communicating with API: not connected")
         return self.data
 
-    def reconnect(self):
-        """Reconnect if Home Assistant not closing.
+    @property
+    def connected(self) -> bool:
+        """Return True when logged in to the doorbell."""
+        return self._connected
+
+    async def async_reconnect(self):
+        """Reconnect now without waiting for the backoff delay."""
+        self._reconnect_attempt = 0
+        self._reconnect_now = True
+        if self._reconnect_call is not None:
+            self._reconnect_call.cancel()
+            self.connect()
+        elif self.client is not None and self._connected:
+            self.client.close_connection()
 
-        Limit retries to once per hour.
+    def connect(self, client: LorexDoorbellClient | None = None):
+        """Start a connection attempt, unless one is already running.
+
+        A logged in client is taken over instead of connecting.
         """
-        self.reconnect_interval += 60
-        self.reconnect_interval = min(3600, self.reconnect_interval)
+        self._reconnect_call = None
+        self._reconnect_now = False
+        if self._connection_task is not None or self._hass_closing:
+            return
+        self._connection_task = self._entry.async_create_background_task(
+            self.hass,
+            self._async_run_connection(client),
+            f"lorex {self.host} connection",
+        )
+
+    async def _async_run_connection(self, client: LorexDoorbellClient | None):
+        """Run the connection, then have the manager schedule the reconnect."""
+        try:
+            await self.run_doorbell(client)
+        finally:
+            self._connection_task = None
+            if not self._hass_closing:
+                self._schedule_reconnect()
 
-        if not self._connected and not self._hass_closing:
-            asyncio.run_coroutine_threadsafe(self.run_doorbell(), self.hass.loop)
+    def _schedule_reconnect(self):
+        """Schedule the next connection attempt.
 
-    async def run_doorbell(self):
+        Reconnects back off exponentially with jitter up to RECONNECT_MAX_DELAY,
+        unless async_reconnect asked for an immediate one.
+        """
+        if self._reconnect_now:
+            delay = 0
+        else:
+            delay = min(
+                RECONNECT_MAX_DELAY,
+                RECONNECT_MIN_DELAY * 2 ** min(self._reconnect_attempt, 16),
+            )
+            delay = random.uniform(delay / 2, delay)
+            self._reconnect_attempt += 1
+        self.metrics.reconnects += 1
+        _LOGGER.info("Reconnecting to %s in %.1f seconds", self.host, delay)
+        self._reconnect_call = self.manager.call_later(delay, self.connect)
+
+    async def run_doorbell(self, client: LorexDoorbellClient | None = None):
         """Run the doorbell client receive messages from client at on_event."""
         cd = {}
         cd["username"] = self.username
@@ -199,26 +447,43 @@ class LorexCoordinator:
         cd["port"] = self.port  # 5000
         cd["host"] = self.host
         cd["on_event"] = self.on_event
+        cd["hold_time"] = self.hold_time
+        cd["metrics"] = self.metrics
+        cd["recorder"] = self.recorder
+        cd["history"] = self.history
+        cd["clock"] = self.clock
+        # keep alives run on the shared scheduler, offset from other doorbells
+        cd["scheduler"] = self.manager
+        cd["keep_alive_phase"] = self.manager.keep_alive_phase(self._entry.entry_id)
 
         loop = asyncio.get_running_loop()
         on_con_lost = loop.create_future()
-
-        transport, protocol = await loop.create_connection(
-            lambda: LorexDoorbellClient(cd, on_con_lost), cd["host"], cd["port"]
-        )
+        transport = None
 
         try:
+            if client is None:
+                transport, self.client = await asyncio.wait_for(
+                    loop.create_connection(
+                        lambda: LorexDoorbellClient(cd, on_con_lost),
+                        cd["host"],
+                        cd["port"],
+                    ),
+                    CONNECT_TIMEOUT,
+                )
+            else:
+                _LOGGER.debug("Taking over the config flow session to %s", self.host)
+                transport, self.client = client.transport, client
+                client.rebind(cd, on_con_lost)
             await on_con_lost
 
         except Exception as ex:  # noqa: BLE001
             exc_type, exc_obj, exc_tb = sys.exc_info()
-            if not self.started:
-                _LOGGER.debug("Exiting Lorex doorbell Client")
-                # return
             line = exc_tb.tb_lineno
             _LOGGER.error(
-                "Connection to Lorex doorbell failed. error: %s, Line: %s", ex, line
+                "Connection to Lorex doorbell failed. error: %r, Line: %s", ex, line
             )
         finally:
-            transport.close()
+            if transport is not None:
+                transport.close()
+            self.client = None
             self._connected = False
@@ -30,6 +30,8 @@ from .const import (
 SERVICE_ENABLE_UPDATES = "enable_updates"
 # Will disable field device updates to the entity
 SERVICE_DISABLE_UPDATES = "disable_updates"
+# Will reconnect to the doorbell now, skipping any reconnect delay
+SERVICE_RECONNECT = "reconnect"
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -58,6 +60,7 @@ async def async_setup_entry(
     platform.async_register_entity_service(
         SERVICE_DISABLE_UPDATES, {}, "async_disable_updates"
     )
+    platform.async_register_entity_service(SERVICE_RECONNECT, {}, "async_reconnect")
 
 
 class LorexMotion(BinarySensorEntity):
@@ -81,7 +84,9 @@ class LorexMotion(BinarySensorEntity):
         This in addition to is_on down below allow the sensor to update
         when async_write_ha_state is called by parent it checks is_on
         """
-        self._coordinator.add_callback(self.async_write_ha_state)
+        self._coordinator.add_callback(
+            self.async_write_ha_state, (VIDEOMOTION, LOREX_CONNECTION)
+        )
         self._attributes["updates_enabled"] = True
 
     async def async_will_remove_from_hass(self) -> None:
@@ -108,6 +113,8 @@ class LorexMotion(BinarySensorEntity):
     @property
     def extra_state_attributes(self):
         """Return attributes, in this case the counter."""
+        suppressed = self._coordinator.metrics.suppressed_events
+        self._attributes["suppressed_events"] = suppressed.get(VIDEOMOTION, 0)
         return self._attributes
 
     @property
@@ -118,7 +125,9 @@ class LorexMotion(BinarySensorEntity):
     async def async_enable_updates(self):
         """Handle  SERVICE_ENABLE_UPDATES."""
         if not self._attributes["updates_enabled"]:
-            self._coordinator.add_callback(self.async_write_ha_state)
+            self._coordinator.add_callback(
+                self.async_write_ha_state, (VIDEOMOTION, LOREX_CONNECTION)
+            )
             self._attributes["updates_enabled"] = True
             self.async_write_ha_state()
 
@@ -129,6 +138,10 @@ class LorexMotion(BinarySensorEntity):
             self._attributes["updates_enabled"] = False
             self.async_write_ha_state()
 
+    async def async_reconnect(self):
+        """Handle SERVICE_RECONNECT."""
+        await self._coordinator.async_reconnect()
+
 
 class LorexHumanMotion(BinarySensorEntity):
     """Doorbell smart human motion sensor."""
@@ -151,7 +164,9 @@ class LorexHumanMotion(BinarySensorEntity):
         This in addition to is_on down below allow the sensor to update
         when async_write_ha_state is called by parent it checks is_on.
         """
-        self._coordinator.add_callback(self.async_write_ha_state)
+        self._coordinator.add_callback(
+            self.async_write_ha_state, (INTELLIFRAME, LOREX_CONNECTION)
+        )
         self._attributes["updates_enabled"] = True
 
     async def async_will_remove_from_hass(self) -> None:
@@ -178,6 +193,8 @@ class LorexHumanMotion(BinarySensorEntity):
     @property
     def extra_state_attributes(self):
         """Return attributes."""
+        suppressed = self._coordinator.metrics.suppressed_events
+        self._attributes["suppressed_events"] = suppressed.get(INTELLIFRAME, 0)
         return self._attributes
     
     @property
@@ -188,7 +205,9 @@ class LorexHumanMotion(BinarySensorEntity):
     async def async_enable_updates(self):
         """Handle  SERVICE_ENABLE_UPDATES."""
         if not self._attributes["updates_enabled"]:
-            self._coordinator.add_callback(self.async_write_ha_state)
+            self._coordinator.add_callback(
+                self.async_write_ha_state, (INTELLIFRAME, LOREX_CONNECTION)
+            )
             self._attributes["updates_enabled"] = True
             self.async_write_ha_state()
 
@@ -198,3 +217,7 @@ class LorexHumanMotion(BinarySensorEntity):
             self._coordinator.remove_callback(self.async_write_ha_state)
             self._attributes["updates_enabled"] = False
             self.async_write_ha_state()
+
+    async def async_reconnect(self):
+        """Handle SERVICE_RECONNECT."""
+        await self._coordinator.async_reconnect()
@@ -3,18 +3,34 @@
 from __future__ import annotations
 
 import asyncio
+import ipaddress
 import logging
-import socket
 from typing import Any
 
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.components.network import async_get_source_ip
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 
-from .const import DOMAIN, LOREX_CLIENT, LOREX_CONNECTION, LOREX_ID
+from .connection_manager import get_connection_manager
+from .const import (
+    CONF_HOLD_TIME,
+    CONF_NETWORK,
+    CONNECT_TIMEOUT,
+    DEFAULT_HOLD_TIME,
+    DOMAIN,
+    LOGIN_FAILED_AUTH,
+    LOGIN_FAILED_CHALLENGE,
+    LOREX_CLIENT,
+    LOREX_CONNECTION,
+    LOREX_ID,
+    SCAN_MAX_HOSTS,
+    VALIDATE_TIMEOUT,
+)
+from .discovery import DiscoveredDevice, async_scan_network, get_discovery
 from .lorex_doorbell_client import LorexDoorbellClient
 
 _LOGGER = logging.getLogger(__name__)
@@ -30,47 +46,29 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
     }
 )
 
-msg = {}
-
 
-async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
+async def validate_input(
+    hass: HomeAssistant, data: dict[str, Any]
+) -> tuple[dict[str, Any], LorexDoorbellClient]:
     """Validate the user input allows us to connect.
 
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
+    Return the status after login and the logged in client, the caller owns
+    the client and closes its transport unless it is handed over.
     """
-    # If your PyPI package is not built with async, pass your methods
-    # to the executor:
-    # await hass.async_add_executor_job(
-    #     your_validate_func, data["username"], data["password"]
-    # )
-    global msg  # noqa: PLW0602
-
-    # callback required for closing the connection once established
+    loop = asyncio.get_running_loop()
+    on_con_lost = loop.create_future()
+    logged_in = loop.create_future()
+
     def message_received(message: dict[str, Any]):
         """Handle callback for connection from doorbell."""
-        global msg  # noqa: PLW0602
-        msg = message.copy()
-        _LOGGER.debug(f"Lorex connection msg {message}")
-        if message[LOREX_CONNECTION] and len(message[LOREX_ID]):
-            if LOREX_CLIENT in message:
-                message[LOREX_CLIENT].close_connection()
-            else:
-                _LOGGER.info("Lorex validation message incorrect")
-
-    # doorbell listens on port 5000 so connect
-    # so test and give invalid host if not listeneing on that port
-
-    sock = socket.socket()
-
-    try:
-        sock.connect((data["host"], data["port"]))
-    except Exception as ex:
-        _LOGGER.info(f"Lorex doorbell = Invalid host@ {data['host']}")
-        raise InvalidHost
-    finally:
-        sock.close()
-
-    _LOGGER.info("Lorex doorbell = Valid host")
+        _LOGGER.debug("Lorex connection msg %s", message)
+        if (
+            message[LOREX_CONNECTION]
+            and message[LOREX_CLIENT] is not None
+            and not logged_in.done()
+        ):
+            logged_in.set_result(message.copy())
 
     cd = {}
     cd["username"] = data["username"]
@@ -79,24 +77,39 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     cd["host"] = data["host"]
     cd["on_event"] = message_received
 
-    loop = asyncio.get_running_loop()
-    on_con_lost = loop.create_future()
-
+    # doorbell listens on port 5000 so connect
+    # so test and give invalid host if not listeneing on that port
     try:
-        transport, protolcol = await loop.create_connection(
-            lambda: LorexDoorbellClient(cd, on_con_lost), data["host"], data["port"]
+        transport, client = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: LorexDoorbellClient(cd, on_con_lost), data["host"], data["port"]
+            ),
+            CONNECT_TIMEOUT,
         )
-    except:
-        raise InvalidAuth
+    except (OSError, asyncio.TimeoutError) as ex:
+        _LOGGER.info("Lorex doorbell = Invalid host@ %s", data["host"])
+        raise InvalidHost from ex
 
     try:
-        await on_con_lost
-    finally:
+        done, _ = await asyncio.wait(
+            (logged_in, on_con_lost),
+            timeout=VALIDATE_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    except BaseException:
         transport.close()
+        raise
 
-    # if msg["lorex_Connection"] == False:
-    #    raise InvalidAuth
-    return msg
+    if logged_in in done and logged_in.result()[LOREX_ID]:
+        return logged_in.result(), client
+
+    transport.close()
+    if client.login_failure == LOGIN_FAILED_AUTH:
+        raise InvalidAuth
+    if client.login_failure == LOGIN_FAILED_CHALLENGE:
+        # the port is open but nothing answered like a doorbell
+        raise InvalidHost
+    raise CannotConnect
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -104,19 +117,140 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler()
+
+    def __init__(self) -> None:
+        """Init."""
+        self._discovery_task: asyncio.Task | None = None
+        self._discovered: dict[str, DiscoveredDevice] = {}
+        self._discovered_device: dict[str, Any] = {}
+        self._network: str | None = None
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the initial step."""
+        """Handle the initial step, search the network or enter the host."""
+        return self.async_show_menu(
+            step_id="user", menu_options=["discovery", "scan", "manual"]
+        )
+
+    async def async_step_discovery(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Search the network for doorbells, the flow shows progress meanwhile."""
+        if self._discovery_task is None:
+            self._discovery_task = self.hass.async_create_task(
+                get_discovery(self.hass).async_search(refresh=True)
+            )
+        if not self._discovery_task.done():
+            return self.async_show_progress(
+                step_id="discovery",
+                progress_action="discovery",
+                progress_task=self._discovery_task,
+            )
+
+        return self._async_discovery_done()
+
+    async def async_step_scan(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Enter a network range to sweep, for networks that block discovery."""
+        errors = {}
+        if user_input is not None:
+            try:
+                network = ipaddress.ip_network(user_input[CONF_NETWORK], strict=False)
+            except ValueError:
+                errors["base"] = "invalid_network"
+            else:
+                if network.num_addresses > SCAN_MAX_HOSTS:
+                    errors["base"] = "network_too_large"
+                else:
+                    self._network = str(network)
+                    return await self.async_step_scan_progress()
+
         if user_input is None:
-            return self.async_show_form(
-                step_id="user", data_schema=STEP_USER_DATA_SCHEMA
+            source_ip = await async_get_source_ip(self.hass)
+            network = ipaddress.ip_network(f"{source_ip}/24", strict=False)
+            user_input = {CONF_NETWORK: str(network)}
+        return self.async_show_form(
+            step_id="scan",
+            data_schema=vol.Schema(
+                {vol.Required(CONF_NETWORK, default=user_input[CONF_NETWORK]): str}
+            ),
+            errors=errors,
+        )
+
+    async def async_step_scan_progress(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Sweep the network range, the flow shows progress meanwhile."""
+        if self._discovery_task is None:
+            self._discovery_task = self.hass.async_create_task(
+                async_scan_network(self._network)
             )
+        if not self._discovery_task.done():
+            return self.async_show_progress(
+                step_id="scan_progress",
+                progress_action="scan",
+                progress_task=self._discovery_task,
+            )
+
+        return self._async_discovery_done()
+
+    @callback
+    def _async_discovery_done(self) -> FlowResult:
+        """Keep the devices found that are not configured yet and pick one."""
+        configured = self._async_current_ids()
+        self._discovered = {}
+        for device in self._discovery_task.result():
+            if device.serial_number not in configured:
+                # a swept host may not give its serial number
+                self._discovered[device.serial_number or device.host] = device
+        self._discovery_task = None
+        return self.async_show_progress_done(
+            next_step_id="pick_device" if self._discovered else "manual"
+        )
+
+    async def async_step_pick_device(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Pick a discovered doorbell, its host and port fill in the next step."""
+        if user_input is not None:
+            device = self._discovered.get(user_input["device"])
+            if device is not None:
+                self._discovered_device = {"host": device.host, "port": device.port}
+            return await self.async_step_manual()
+
+        devices = {
+            key: f"{device.host} ({device.device_type} {device.serial_number})"
+            for key, device in self._discovered.items()
+        }
+        devices["manual"] = "Other, enter the host"
+        return self.async_show_form(
+            step_id="pick_device",
+            data_schema=vol.Schema({vol.Required("device"): vol.In(devices)}),
+        )
+
+    async def async_step_manual(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Enter the doorbell host and login, host and port from discovery."""
+        data_schema = self.add_suggested_values_to_schema(
+            STEP_USER_DATA_SCHEMA, self._discovered_device
+        )
+        if user_input is None:
+            return self.async_show_form(step_id="manual", data_schema=data_schema)
 
         errors = {}
         if user_input is not None:
             try:
-                info = await validate_input(self.hass, user_input)
+                info, client = await validate_input(self.hass, user_input)
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except InvalidAuth:
@@ -127,16 +261,49 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
             else:
-                if info is not None:
-                    user_input["uuid"] = info[LOREX_ID]
+                user_input["uuid"] = info[LOREX_ID]
+                handed_over = False
+                try:
+                    # aborts when another flow for the doorbell is in progress
                     await self.async_set_unique_id(info[LOREX_ID])
                     self._abort_if_unique_id_configured()
-                    return self.async_create_entry(
-                        title=user_input["name"], data=user_input
+                    # the new entry continues this session instead of logging in
+                    get_connection_manager(self.hass).hand_over(
+                        info[LOREX_ID], client
                     )
+                    handed_over = True
+                finally:
+                    if not handed_over:
+                        client.transport.close()
+                return self.async_create_entry(
+                    title=user_input["name"], data=user_input
+                )
+
+        return self.async_show_form(
+            step_id="manual", data_schema=data_schema, errors=errors
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Lorex options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the motion hold time."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
 
+        hold_time = self.config_entry.options.get(CONF_HOLD_TIME, DEFAULT_HOLD_TIME)
         return self.async_show_form(
-            step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_HOLD_TIME, default=hold_time): vol.All(
+                        vol.Coerce(float), vol.Range(min=0, max=60)
+                    ),
+                }
+            ),
         )
 
 
@@ -0,0 +1,189 @@
+"""Shared scheduling of the doorbell connections.
+
+One manager per Home Assistant instance runs the keep alives and reconnects of
+every doorbell from a single task, instead of timers per device.
+"""
+
+from __future__ import annotations
+
+from _collections_abc import Callable
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_CONNECTION_MANAGER, DOMAIN, SESSION_HANDOVER_TIMEOUT
+
+if TYPE_CHECKING:
+    from . import LorexCoordinator
+    from .lorex_doorbell_client import LorexDoorbellClient
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# fractional part of the golden ratio, successive multiples of it are spread
+# evenly over [0, 1) however many there are
+GOLDEN_FRACTION = 0.6180339887498949
+
+
+def get_connection_manager(hass: HomeAssistant) -> LorexConnectionManager:
+    """Return the connection manager, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    manager = domain_data.get(DATA_CONNECTION_MANAGER)
+    if manager is None:
+        manager = domain_data[DATA_CONNECTION_MANAGER] = LorexConnectionManager(hass)
+    return manager
+
+
+class ScheduledCall:
+    """A callback waiting in the connection manager schedule."""
+
+    __slots__ = ("args", "callback", "cancelled", "when")
+
+    def __init__(self, when: float, callback: Callable, args: tuple) -> None:
+        """Init."""
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the callback from running, it is dropped when it comes due."""
+        self.cancelled = True
+
+
+class LorexConnectionManager:
+    """Own the connections of all doorbells.
+
+    Coordinators register here, their reconnects and the keep alives of their
+    clients are scheduled with call_later and run by one scheduler task.
+    Clients logged in by the config flow wait here for the coordinator of the
+    new entry.
+    """
+
+    coordinators: dict[str, LorexCoordinator]
+    sessions: dict[str, tuple[LorexDoorbellClient, asyncio.TimerHandle]]
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Init."""
+        self.hass = hass
+        self.coordinators = {}
+        # registration slot of each entry, the lowest free one is reused
+        self._slots: dict[str, int] = {}
+        self._calls: list[tuple[float, int, ScheduledCall]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.sessions = {}
+
+    def add(self, entry_id: str, coordinator: LorexCoordinator):
+        """Register a coordinator, start the scheduler with the first one."""
+        self.coordinators[entry_id] = coordinator
+        if entry_id not in self._slots:
+            used = set(self._slots.values())
+            self._slots[entry_id] = next(
+                slot for slot in itertools.count() if slot not in used
+            )
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "lorex connection manager"
+            )
+
+    def remove(self, entry_id: str):
+        """Unregister a coordinator, stop the scheduler after the last one."""
+        self.coordinators.pop(entry_id, None)
+        self._slots.pop(entry_id, None)
+        if not self.coordinators and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._calls.clear()
+
+    def call_later(self, delay: float, callback: Callable, *args) -> ScheduledCall:
+        """Run callback(*args) on the scheduler after delay seconds."""
+        call = ScheduledCall(self.hass.loop.time() + delay, callback, args)
+        heapq.heappush(self._calls, (call.when, next(self._counter), call))
+        if self._calls[0][2] is call:
+            self._wakeup.set()
+        return call
+
+    def hand_over(self, unique_id: str, client: LorexDoorbellClient):
+        """Keep a logged in client for the entry with unique_id.
+
+        The client is closed if no coordinator takes it over within
+        SESSION_HANDOVER_TIMEOUT seconds. The scheduler may not be running
+        yet, the timeout runs on the event loop.
+        """
+        self.release(unique_id)
+        handle = self.hass.loop.call_later(
+            SESSION_HANDOVER_TIMEOUT, self.release, unique_id
+        )
+        self.sessions[unique_id] = (client, handle)
+
+    def take_over(self, unique_id: str | None) -> LorexDoorbellClient | None:
+        """Return the client kept for unique_id if it is still connected."""
+        client, handle = self.sessions.pop(unique_id, (None, None))
+        if client is None:
+            return None
+        handle.cancel()
+        if client.transport is None or client.transport.is_closing():
+            return None
+        return client
+
+    def release(self, unique_id: str):
+        """Close the client kept for unique_id, if any."""
+        client, handle = self.sessions.pop(unique_id, (None, None))
+        if client is not None:
+            handle.cancel()
+            _LOGGER.debug("Closing unclaimed session for %s", unique_id)
+            client.transport.close()
+
+    def keep_alive_phase(self, entry_id: str) -> float:
+        """Return a fraction of the keep alive interval to offset a doorbell by.
+
+        Doorbells are spread over the interval so their keep alives do not
+        all fire together after Home Assistant starts. The phase comes from
+        the slot the entry registered in, so it does not change as entries
+        set up concurrently register after it.
+        """
+        slot = self._slots.get(entry_id)
+        if slot is None:
+            return 0.0
+        return (slot * GOLDEN_FRACTION) % 1
+
+    def health(self) -> dict[str, Any]:
+        """Return the state of all doorbell connections."""
+        disconnected = sorted(
+            coordinator.host
+            for coordinator in self.coordinators.values()
+            if not coordinator.connected
+        )
+        return {
+            "doorbells": len(self.coordinators),
+            "connected": len(self.coordinators) - len(disconnected),
+            "disconnected": disconnected,
+            "scheduled_calls": len(self._calls),
+        }
+
+    async def _async_run(self):
+        """Run scheduled calls as they come due."""
+        loop = asyncio.get_running_loop()
+        calls = self._calls
+        while True:
+            now = loop.time()
+            while calls and calls[0][0] <= now:
+                call = heapq.heappop(calls)[2]
+                if call.cancelled:
+                    continue
+                try:
+                    call.callback(*call.args)
+                except Exception:  # noqa: BLE001
+                    _LOGGER.exception("Error in scheduled doorbell call")
+
+            self._wakeup.clear()
+            timeout = calls[0][0] - now if calls else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
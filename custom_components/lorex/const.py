@@ -14,8 +14,9 @@ LIGHT = "light"
 CAMERA = "camera"
 SELECT = "select"
 EVENT = "event"
+SENSOR = "sensor"
 # currently used by lorex api
-PLATFORMS = [BINARY_SENSOR, CAMERA, EVENT]
+PLATFORMS = [BINARY_SENSOR, CAMERA, EVENT, SENSOR]
 
 
 # Configuration and options
@@ -24,9 +25,64 @@ CONF_ENABLED = "enabled"
 CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 CONF_PORT = "port"
+CONF_HOLD_TIME = "hold_time"
+CONF_NETWORK = "network"
+
+# hass.data[DOMAIN] key of the shared connection manager
+DATA_CONNECTION_MANAGER = "connection_manager"
+# hass.data[DOMAIN] key of the discovered doorbells
+DATA_DISCOVERY = "discovery"
+
+# Storage for the device identity so entities can be created before login
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.identity"
 
 # Defaults
 DEFAULT_NAME = "Lorex"
+# DHIP port of the doorbells
+DEFAULT_PORT = 5000
+# seconds a motion Stop is held back so a following Start merges with it, 0 is off
+DEFAULT_HOLD_TIME = 0
+# seconds to wait for the doorbell to answer a request
+DEFAULT_REQUEST_TIMEOUT = 10
+# keep alive answer timeout, retry interval after a miss and misses before the
+# doorbell is considered dead
+KEEP_ALIVE_TIMEOUT = 5
+KEEP_ALIVE_RETRY_INTERVAL = 2
+KEEP_ALIVE_MAX_MISSES = 3
+# seconds to wait for the tcp connection, reconnect backoff limits
+CONNECT_TIMEOUT = 10
+RECONNECT_MIN_DELAY = 2
+RECONNECT_MAX_DELAY = 300
+# seconds setup waits for login and the device details before retrying later
+SETUP_TIMEOUT = 30
+# seconds the config flow waits for login and the device details
+VALIDATE_TIMEOUT = 20
+# seconds a client logged in by the config flow waits for its coordinator
+SESSION_HANDOVER_TIMEOUT = 60
+# seconds each port probe of determine_type waits for the connection
+PROBE_TIMEOUT = 2
+# seconds discovery listens for answers, and keeps a doorbell after it was seen
+DISCOVERY_TIMEOUT = 3
+DISCOVERY_TTL = 300
+# network scan: connects in flight, new connects per second, seconds per host
+# and the largest network swept
+SCAN_CONCURRENCY = 64
+SCAN_RATE = 100
+SCAN_TIMEOUT = 1.5
+SCAN_MAX_HOSTS = 1024
+# frames kept for diagnostics, and the bytes of each frame kept
+FRAME_RECORDER_SIZE = 64
+FRAME_RECORDER_BYTES = 1024
+# events kept in the history, the seconds covered by its statistics and the
+# time buckets the window is counted in
+EVENT_HISTORY_SIZE = 512
+EVENT_STATS_WINDOW = 3600
+EVENT_STATS_BUCKETS = 60
+# latencies kept for the percentiles
+LATENCY_SAMPLES = 256
+# seconds the doorbell clock may be off before it is reported as drifting
+CLOCK_DRIFT_THRESHOLD = 2
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
@@ -46,14 +102,30 @@ DAHUA_BUILD_DATE = "buildDate"
 DAHUA_CONSOLE_RUN_CMD = "console.runCmd"
 DAHUA_GLOBAL_LOGIN = "global.login"
 DAHUA_GLOBAL_KEEPALIVE = "global.keepAlive"
+DAHUA_GLOBAL_GETCURRENTTIME = "global.getCurrentTime"
 DAHUA_EVENT_MANAGER_ATTACH = "eventManager.attach"
+DAHUA_EVENT_MANAGER_DETACH = "eventManager.detach"
 DAHUA_CONFIG_MANAGER_GETCONFIG = "configManager.getConfig"
 DAHUA_MAGICBOX_GETSOFTWAREVERSION = "magicBox.getSoftwareVersion"
 DAHUA_MAGICBOX_GETDEVICETYPE = "magicBox.getDeviceType"
 DAHUA_MAGICBOX_GETSYSINFO = "magicBox.getSysytemInfo"
+DAHUA_CLIENT_NOTIFY_EVENT_STREAM = "client.notifyEventStream"
+DAHUA_LOGIN_CHALLENGE = "Component error: login challenge!"
+DAHUA_DHDISCOVER_SEARCH = "DHDiscover.search"
+DAHUA_CLIENT_NOTIFY_DEV_INFO = "client.notifyDevInfo"
 
 DAHUA_ALLOWED_DETAILS = [DAHUA_DEVICE_TYPE, DAHUA_SERIAL_NUMBER]
 
+# DHIP framing, every message is a 32 byte header followed by the json payload
+DHIP_HEADER_SIZE = 32
+DHIP_MAGIC = b"DHIP"
+# larger payload lengths are taken as a corrupt header, the biggest real
+# payloads (getConfig dumps) are a few hundred kB
+DHIP_MAX_PAYLOAD = 4 * 1024 * 1024
+# Dahua discovery, DHIP frames over udp sent to the multicast group and broadcast
+DHDISCOVER_PORT = 37810
+DHDISCOVER_MULTICAST = "239.255.255.251"
+
 
 # Lorextyps used in utils to determine the system
 class LorexType(Enum):
@@ -70,13 +142,20 @@ class LorexType(Enum):
 LOREX_MODEL = "lorexModel"
 LOREX_ID = "lorexId"
 LOREX_TIME_STAMP = "lorexTime"
+# time.monotonic() when the event was reported, after any hold time
+LOREX_RECEIVED = "lorexReceived"
 INTELLIFRAME = "IntelliFrame"
 VIDEOMOTION = "VideoMotion"
 ALARMLOCAL = "AlarmLocal"
 LOREX_CONNECTION = "lorex_Connection"
 LOREX_CLIENT = "lorex_Client"
 LOREX_GETTING_EVENTS = "lorex_events"
+# login step that failed, no login challenge means it is not a doorbell
+LOGIN_FAILED_CHALLENGE = "challenge"
+LOGIN_FAILED_AUTH = "auth"
 LOREX_DOORBELL_CODES = [ALARMLOCAL, INTELLIFRAME, VIDEOMOTION]
+# codes whose Stop/Start flaps are merged within the hold time
+LOREX_HOLD_CODES = [INTELLIFRAME, VIDEOMOTION]
 
 
 # doorbell event types used for event entity
@@ -0,0 +1,103 @@
+"""Diagnostics support for Lorex."""
+
+from datetime import datetime, timezone
+import re
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .__init__ import LorexCoordinator
+from .const import (
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    DAHUA_SERIAL_NUMBER,
+    DOMAIN,
+    LOREX_CLIENT,
+    LOREX_ID,
+)
+from .lorex_doorbell_client import JSON_CODEC
+
+TO_REDACT = {
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    DAHUA_SERIAL_NUMBER,
+    LOREX_ID,
+    # login request parameter
+    "userName",
+    # login challenge, the realm is "Login to <serial number>"
+    "realm",
+    "random",
+    # T2UServer config, the cloud id of the doorbell
+    "UUID",
+}
+
+_METHOD = re.compile(rb'"method"\s*:\s*"([\w.]+)"')
+
+
+def _frame(frame: dict[str, Any]) -> dict[str, Any]:
+    """Decode a recorded frame, redacting complete json payloads."""
+    payload = frame["payload"]
+    decoded = {
+        "direction": frame["direction"],
+        "time": datetime.fromtimestamp(frame["time"], timezone.utc).isoformat(),
+        "length": frame["length"],
+    }
+    try:
+        decoded["message"] = async_redact_data(JSON_CODEC.loads(payload), TO_REDACT)
+    except Exception:  # noqa: BLE001
+        # truncated or not json, the text can not be redacted so only the method
+        # is kept, the login frames are always short enough to parse
+        method = _METHOD.search(payload)
+        decoded["method"] = method[1].decode() if method else None
+    return decoded
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    lorex: LorexCoordinator = hass.data[DOMAIN][entry.entry_id]
+    metrics = lorex.metrics
+
+    status = {key: value for key, value in lorex.data.items() if key != LOREX_CLIENT}
+    health = lorex.manager.health()
+    # the hosts of the other doorbells are not part of this entry
+    health["disconnected"] = len(health["disconnected"])
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "dahua_details": async_redact_data(lorex.dahua_details, TO_REDACT),
+        "status": async_redact_data(status, TO_REDACT),
+        "connected": lorex.connected,
+        "metrics": {
+            "frames_received": metrics.frames_received,
+            "bytes_received": metrics.bytes_received,
+            "frames_sent": metrics.frames_sent,
+            "bytes_sent": metrics.bytes_sent,
+            "parse_failures": metrics.parse_failures,
+            "keep_alive_rtt": metrics.keep_alive_rtt,
+            "keep_alive_rtt_ewma": metrics.keep_alive_rtt_ewma,
+            "reconnects": metrics.reconnects,
+            "events": dict(metrics.events),
+            "suppressed_events": dict(metrics.suppressed_events),
+            "event_latency": metrics.event_latency.percentiles(0.5, 0.95, 0.99),
+            "event_latency_resolution": metrics.event_latency_resolution,
+            "write_latency": metrics.write_latency.percentiles(0.5, 0.95, 0.99),
+        },
+        "clock": {
+            "offset": lorex.clock.offset,
+            "samples": lorex.clock.samples,
+            "drift": lorex.clock.drift(),
+            "drifting": lorex.clock.drifting,
+        },
+        "connection_manager": health,
+        "events": lorex.history.events(),
+        "frames": [_frame(frame) for frame in lorex.recorder.frames()],
+    }
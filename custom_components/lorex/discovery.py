@@ -0,0 +1,269 @@
+"""Find doorbells on the local network.
+
+A DHDiscover.search frame is sent to the multicast group and broadcast on
+udp port 37810, devices answer with client.notifyDevInfo frames. Answers
+are collected for a short window and deduplicated by serial number.
+
+Where multicast does not reach the doorbells a network range can be swept
+for port 5000 instead, hosts with the port open are confirmed by the DHIP
+login challenge.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .const import (
+    DAHUA_CLIENT_NOTIFY_DEV_INFO,
+    DAHUA_DHDISCOVER_SEARCH,
+    DATA_DISCOVERY,
+    DEFAULT_PORT,
+    DHDISCOVER_MULTICAST,
+    DHDISCOVER_PORT,
+    DHIP_HEADER_SIZE,
+    DHIP_MAGIC,
+    DISCOVERY_TIMEOUT,
+    DISCOVERY_TTL,
+    DOMAIN,
+    SCAN_CONCURRENCY,
+    SCAN_RATE,
+    SCAN_TIMEOUT,
+)
+from .lorex_doorbell_client import DHIP_HEADER, JSON_CODEC, LorexDoorbellClient
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# the login challenge realm of a doorbell ends with its serial number
+REALM_PREFIX = "Login to "
+
+DISCOVERY_TARGETS = (
+    (DHDISCOVER_MULTICAST, DHDISCOVER_PORT),
+    ("255.255.255.255", DHDISCOVER_PORT),
+)
+
+
+class DiscoveredDevice(NamedTuple):
+    """A device that answered the search."""
+
+    serial_number: str
+    host: str
+    port: int
+    device_type: str
+    mac: str
+
+
+def get_discovery(hass: HomeAssistant) -> LorexDiscovery:
+    """Return the discovery cache, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    discovery = domain_data.get(DATA_DISCOVERY)
+    if discovery is None:
+        discovery = domain_data[DATA_DISCOVERY] = LorexDiscovery()
+    return discovery
+
+
+class DHDiscoverProtocol(asyncio.DatagramProtocol):
+    """Collect the client.notifyDevInfo answers to a search."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.devices: dict[str, DiscoveredDevice] = {}
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]):
+        """Add the device in an answer, datagrams of other protocols are ignored."""
+        if len(data) < DHIP_HEADER_SIZE:
+            return
+        _, magic, _, length, _, _, _ = DHIP_HEADER.unpack_from(data)
+        if magic != DHIP_MAGIC:
+            return
+        payload = data[DHIP_HEADER_SIZE : DHIP_HEADER_SIZE + length]
+        try:
+            message = JSON_CODEC.loads(payload)
+        except Exception as ex:  # noqa: BLE001
+            _LOGGER.debug("Invalid discovery answer from %s: %r", addr[0], ex)
+            return
+        if message.get("method") != DAHUA_CLIENT_NOTIFY_DEV_INFO:
+            return
+
+        device = self.parse_device_info(message.get("params") or {}, addr[0])
+        if device is not None:
+            self.devices[device.serial_number] = device
+
+    def error_received(self, exc: Exception):
+        """Sending to one of the targets failed, the others still work."""
+        _LOGGER.debug("Discovery error: %r", exc)
+
+    @staticmethod
+    def parse_device_info(params: dict[str, Any], sender: str):
+        """Return the device of a client.notifyDevInfo, None without serial."""
+        info = params.get("deviceInfo") or {}
+        serial_number = info.get("SerialNo")
+        if not serial_number:
+            return None
+        address = info.get("IPv4Address") or {}
+        return DiscoveredDevice(
+            serial_number,
+            address.get("IPAddress") or sender,
+            DEFAULT_PORT,
+            info.get("DeviceType") or "",
+            info.get("Mac") or "",
+        )
+
+
+async def async_discover(
+    timeout: float = DISCOVERY_TIMEOUT,
+    targets: tuple[tuple[str, int], ...] = DISCOVERY_TARGETS,
+) -> list[DiscoveredDevice]:
+    """Search for devices and return the ones that answered within timeout."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    sock.setblocking(False)
+    sock.bind(("", 0))
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        DHDiscoverProtocol, sock=sock
+    )
+    try:
+        # uni asks for the answers to be sent to our address instead of multicast
+        search = LorexDoorbellClient.convert_message(
+            {"method": DAHUA_DHDISCOVER_SEARCH, "params": {"mac": "", "uni": 1}}
+        )
+        for target in targets:
+            transport.sendto(search, target)
+        await asyncio.sleep(timeout)
+    finally:
+        transport.close()
+
+    _LOGGER.debug("Discovered %s", list(protocol.devices.values()))
+    return list(protocol.devices.values())
+
+
+async def _async_confirm_dhip(host: str, port: int) -> DiscoveredDevice | None:
+    """Return the device if host answers a global.login with the challenge."""
+    loop = asyncio.get_running_loop()
+    config = {"username": "admin", "on_event": lambda status: None, "login": False}
+    try:
+        transport, client = await loop.create_connection(
+            lambda: LorexDoorbellClient(config, loop.create_future()), host, port
+        )
+    except OSError:
+        return None
+
+    try:
+        if not await client.pre_login():
+            return None
+    except Exception as ex:  # noqa: BLE001
+        _LOGGER.debug("No login challenge from %s: %r", host, ex)
+        return None
+    finally:
+        transport.close()
+
+    realm = client.realm or ""
+    serial_number = realm[len(REALM_PREFIX) :] if realm.startswith(REALM_PREFIX) else ""
+    if " " in serial_number:
+        serial_number = ""
+    return DiscoveredDevice(serial_number, host, port, "", "")
+
+
+async def async_scan_network(
+    network: str,
+    port: int = DEFAULT_PORT,
+    concurrency: int = SCAN_CONCURRENCY,
+    rate: float = SCAN_RATE,
+    timeout: float = SCAN_TIMEOUT,
+) -> list[DiscoveredDevice]:
+    """Sweep the hosts of network, for example 192.168.1.0/24, for DHIP on port.
+
+    At most rate connects start per second and at most concurrency hosts are
+    probed at once. Each host has timeout seconds to accept the connection
+    and answer the login challenge.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(host: str) -> DiscoveredDevice | None:
+        try:
+            return await asyncio.wait_for(_async_confirm_dhip(host, port), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            semaphore.release()
+
+    hosts = ipaddress.ip_network(network, strict=False).hosts()
+    probes: list[asyncio.Task] = []
+    start = loop.time()
+    try:
+        for index, host in enumerate(hosts):
+            await semaphore.acquire()
+            delay = start + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            probes.append(loop.create_task(probe(str(host))))
+        found = await asyncio.gather(*probes)
+    finally:
+        for task in probes:
+            task.cancel()
+
+    devices = [device for device in found if device is not None]
+    _LOGGER.debug("Found %s in %s", devices, network)
+    return devices
+
+
+class LorexDiscovery:
+    """Devices found by discovery, each kept for DISCOVERY_TTL after it was seen.
+
+    Searches run in the background, callers at the same time share one.
+    """
+
+    def __init__(self, ttl: float = DISCOVERY_TTL, **discover_args: Any) -> None:
+        """Init, discover_args are passed to async_discover."""
+        self.ttl = ttl
+        self._discover_args = discover_args
+        self._seen: dict[str, tuple[DiscoveredDevice, float]] = {}
+        self._search: asyncio.Task | None = None
+        self._searched = None
+
+    @property
+    def devices(self) -> list[DiscoveredDevice]:
+        """Return the devices seen within the ttl."""
+        oldest = time.monotonic() - self.ttl
+        self._seen = {
+            serial: seen for serial, seen in self._seen.items() if seen[1] > oldest
+        }
+        return [device for device, _ in self._seen.values()]
+
+    async def async_search(self, refresh: bool = False) -> list[DiscoveredDevice]:
+        """Return the cached devices, searching first if the cache is old."""
+        fresh = (
+            self._searched is not None and time.monotonic() - self._searched < self.ttl
+        )
+        if refresh or not fresh:
+            if self._search is None:
+                self._search = asyncio.get_running_loop().create_task(
+                    self._async_search()
+                )
+            await asyncio.shield(self._search)
+        return self.devices
+
+    async def _async_search(self):
+        """Run a search and add the answers to the cache."""
+        try:
+            devices = await async_discover(**self._discover_args)
+        except OSError as ex:
+            _LOGGER.warning("Discovery failed: %r", ex)
+            devices = []
+        finally:
+            self._search = None
+        now = time.monotonic()
+        self._searched = now
+        for device in devices:
+            self._seen[device.serial_number] = (device, now)
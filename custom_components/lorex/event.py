@@ -82,7 +82,9 @@ class LorexPressed(EventEntity):
 
     async def async_added_to_hass(self) -> None:
         """Register callbacks with coordinator."""
-        self._coordinator.add_callback(self._async_handle_event)
+        self._coordinator.add_callback(
+            self._async_handle_event, (ALARMLOCAL, LOREX_CONNECTION)
+        )
 
     async def async_will_remove_from_hass(self) -> None:
         """Entity being removed from hass."""
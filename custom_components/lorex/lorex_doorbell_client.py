@@ -1,40 +1,542 @@
 """API for doorbell."""
 
 from _collections_abc import Callable
+from array import array
 import asyncio
+from datetime import datetime, timezone
+from functools import lru_cache
 import hashlib
 import json
 import logging
 import struct
 import sys
-from threading import Timer
-from typing import Any, Optional
+import time
+from typing import Any, NamedTuple, Optional
 
 from .const import (
     ALARMLOCAL,
+    CLOCK_DRIFT_THRESHOLD,
     DAHUA_BUILD_DATE,
+    DAHUA_CLIENT_NOTIFY_EVENT_STREAM,
     DAHUA_CONFIG_MANAGER_GETCONFIG,
     DAHUA_DEVICE_TYPE,
     DAHUA_EVENT_MANAGER_ATTACH,
+    DAHUA_EVENT_MANAGER_DETACH,
+    DAHUA_GLOBAL_GETCURRENTTIME,
     DAHUA_GLOBAL_KEEPALIVE,
     DAHUA_GLOBAL_LOGIN,
+    DAHUA_LOGIN_CHALLENGE,
     DAHUA_MAGICBOX_GETDEVICETYPE,
     DAHUA_MAGICBOX_GETSOFTWAREVERSION,
     DAHUA_MAGICBOX_GETSYSINFO,
     DAHUA_SERIAL_NUMBER,
     DAHUA_VERSION,
+    DEFAULT_REQUEST_TIMEOUT,
+    DHIP_HEADER_SIZE,
+    DHIP_MAGIC,
+    DHIP_MAX_PAYLOAD,
+    EVENT_HISTORY_SIZE,
+    EVENT_STATS_BUCKETS,
+    EVENT_STATS_WINDOW,
+    FRAME_RECORDER_BYTES,
+    FRAME_RECORDER_SIZE,
     INTELLIFRAME,
+    KEEP_ALIVE_MAX_MISSES,
+    KEEP_ALIVE_RETRY_INTERVAL,
+    KEEP_ALIVE_TIMEOUT,
+    LOGIN_FAILED_AUTH,
+    LOGIN_FAILED_CHALLENGE,
+    LATENCY_SAMPLES,
     LOREX_CLIENT,
     LOREX_CONNECTION,
     LOREX_DOORBELL_CODES,
     LOREX_GETTING_EVENTS,
+    LOREX_HOLD_CODES,
     LOREX_ID,
     LOREX_MODEL,
+    LOREX_RECEIVED,
     LOREX_TIME_STAMP,
     VIDEOMOTION,
 )
 
 _LOGGER = logging.getLogger(__name__)
+# opt-in trace of every frame sent and received, enable with debug logging for
+# custom_components.lorex.lorex_doorbell_client.frames
+_FRAME_LOGGER = logging.getLogger(f"{__name__}.frames")
+if _FRAME_LOGGER.level == logging.NOTSET:
+    _FRAME_LOGGER.setLevel(logging.INFO)
+# payload bytes included in a frame trace
+FRAME_TRACE_BYTES = 120
+
+
+class JsonCodec(NamedTuple):
+    """Json backend used for DHIP payloads.
+
+    loads accepts bytes or a memoryview, dumps returns compact utf-8 bytes.
+    """
+
+    name: str
+    loads: Callable[[Any], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _orjson_codec() -> JsonCodec:
+    import orjson  # noqa: PLC0415
+
+    return JsonCodec("orjson", orjson.loads, orjson.dumps)
+
+
+def _msgspec_codec() -> JsonCodec:
+    import msgspec  # noqa: PLC0415
+
+    return JsonCodec("msgspec", msgspec.json.decode, msgspec.json.encode)
+
+
+def _stdlib_codec() -> JsonCodec:
+    def loads(payload):
+        return json.loads(str(payload, "utf-8"))
+
+    def dumps(data):
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    return JsonCodec("json", loads, dumps)
+
+
+# in order of preference, stdlib json is always available
+JSON_CODECS = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _stdlib_codec,
+}
+
+
+def load_json_codec(name: Optional[str] = None) -> JsonCodec:
+    """Return the named json codec or the fastest one installed."""
+    if name is not None:
+        return JSON_CODECS[name]()
+
+    for factory in JSON_CODECS.values():
+        try:
+            return factory()
+        except ImportError:
+            continue
+
+    return _stdlib_codec()
+
+
+JSON_CODEC = load_json_codec()
+
+# header size, magic, reserved, payload length, reserved, payload length, reserved
+DHIP_HEADER = struct.Struct("<I4sQIIII")
+# outbound headers only differ in the payload lengths after the constant prefix
+DHIP_HEADER_PREFIX = DHIP_HEADER.pack(DHIP_HEADER_SIZE, DHIP_MAGIC, 0, 0, 0, 0, 0)[:16]
+DHIP_HEADER_LENGTHS = struct.Struct("<IIII")
+
+
+class DhipFrameDecoder:
+    """Split the DHIP byte stream from the doorbell into frame payloads.
+
+    The payload length is read from the header so a read holding several
+    frames, or a frame split across reads, is decoded correctly. A header
+    is only trusted with the magic, its own size in the first field and a
+    payload length of at most DHIP_MAX_PAYLOAD.
+    """
+
+    def __init__(self, log_level: int = logging.ERROR) -> None:
+        """Init, log_level is used to report data that is not DHIP."""
+        self._buffer = bytearray()
+        self.log_level = log_level
+
+    def feed(self, data: bytes):
+        """Add received data and yield every complete payload in order.
+
+        Payloads are memoryviews into the receive buffer and are only valid
+        until the next payload is requested.
+        """
+        buffer = self._buffer
+        buffer += data
+        start = 0
+        view = memoryview(buffer)
+        try:
+            while len(view) - start >= DHIP_HEADER_SIZE:
+                size, magic, _, length, _, _, _ = DHIP_HEADER.unpack_from(
+                    view, start
+                )
+                if (
+                    magic != DHIP_MAGIC
+                    or size != DHIP_HEADER_SIZE
+                    or length > DHIP_MAX_PAYLOAD
+                ):
+                    # lost framing, skip ahead to the next header
+                    index = buffer.find(DHIP_MAGIC, start + 5)
+                    _LOGGER.log(self.log_level, "Invalid DHIP header, discarding data")
+                    if index == -1:
+                        start = len(buffer) - 7
+                        break
+                    start = index - 4
+                    continue
+
+                end = start + DHIP_HEADER_SIZE + length
+                if len(view) < end:
+                    break
+
+                payload = view[start + DHIP_HEADER_SIZE : end]
+                try:
+                    yield payload
+                finally:
+                    payload.release()
+                start = end
+        finally:
+            view.release()
+            del buffer[:start]
+
+
+@lru_cache(maxsize=64)
+def parse_locale_time(locale_time: Optional[str]) -> Optional[float]:
+    """Return a device LocaleTime in seconds, reading the time as if it was UTC.
+
+    The events of one second share a LocaleTime, the cache parses it once.
+    """
+    try:
+        return (
+            datetime.fromisoformat(locale_time).replace(tzinfo=timezone.utc).timestamp()
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyStats:
+    """The last latencies measured, for percentiles."""
+
+    def __init__(self, size: int = LATENCY_SAMPLES) -> None:
+        """Init."""
+        self.size = size
+        self.count = 0
+        self._samples = array("d", bytes(8 * size))
+
+    def add(self, latency: float):
+        """Add a latency in seconds, overwriting the oldest when full."""
+        self._samples[self.count % self.size] = latency
+        self.count += 1
+
+    def percentiles(self, *fractions: float) -> list[Optional[float]]:
+        """Return the latency below which each fraction of the samples are."""
+        samples = sorted(self._samples[: min(self.count, self.size)])
+        if not samples:
+            return [None] * len(fractions)
+        last = len(samples) - 1
+        return [samples[round(fraction * last)] for fraction in fractions]
+
+
+class DeviceClock:
+    """Estimate of the doorbell clock from round trips of global.getCurrentTime.
+
+    offset is the device time, read as UTC, minus time.monotonic(). Samples
+    over slow round trips are skipped, the rest are averaged which also
+    smooths the one second resolution of the device time.
+    """
+
+    # weight of the newest sample in the moving average
+    OFFSET_EWMA_WEIGHT = 0.1
+    # seconds, a slower round trip says too little about when the time was read
+    MAX_SAMPLE_RTT = 1.0
+
+    def __init__(
+        self,
+        utc_offset: Optional[Callable[[], float]] = None,
+        threshold: float = CLOCK_DRIFT_THRESHOLD,
+    ) -> None:
+        """Init.
+
+        utc_offset returns the seconds local time is ahead of UTC, the device
+        clock is expected to show local time.
+        """
+        self.offset: Optional[float] = None
+        self.samples = 0
+        self.threshold = threshold
+        self.drifting = False
+        self._utc_offset = utc_offset or (lambda: time.localtime().tm_gmtoff)
+
+    def add_sample(self, device_time: float, sent: float, received: float):
+        """Add a device time read between the monotonic times sent and received."""
+        if received - sent > self.MAX_SAMPLE_RTT:
+            return
+        # the device time is truncated to the second, assume the middle of it
+        sample = device_time + 0.5 - (sent + received) / 2
+        if self.offset is None:
+            self.offset = sample
+        else:
+            self.offset += self.OFFSET_EWMA_WEIGHT * (sample - self.offset)
+        self.samples += 1
+
+        drift = self.drift()
+        drifting = abs(drift) > self.threshold
+        if drifting != self.drifting:
+            self.drifting = drifting
+            if drifting:
+                _LOGGER.warning("Doorbell clock is %.1f seconds off", drift)
+            else:
+                _LOGGER.info("Doorbell clock within %s seconds again", self.threshold)
+
+    def to_monotonic(
+        self, device_time: float, fraction: Optional[float] = None
+    ) -> float:
+        """Return the time.monotonic() time of a device time.
+
+        fraction is the part of the second the whole second device_time was
+        read at, the middle of the second when it is not known.
+        """
+        return device_time + (0.5 if fraction is None else fraction) - self.offset
+
+    def drift(self) -> Optional[float]:
+        """Return the seconds the device clock is ahead of the local clock."""
+        if self.offset is None:
+            return None
+        device_offset = self.offset + time.monotonic() - time.time()
+        return device_offset - self._utc_offset()
+
+
+class ProtocolMetrics:
+    """Counters updated by the client, kept by the coordinator across reconnects."""
+
+    # weight of the newest keep alive round trip in the moving average
+    RTT_EWMA_WEIGHT = 0.2
+
+    def __init__(self) -> None:
+        """Init."""
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.parse_failures = 0
+        self.keep_alive_rtt: Optional[float] = None
+        self.keep_alive_rtt_ewma: Optional[float] = None
+        self.reconnects = 0
+        self.events: dict[str, int] = {}
+        self.suppressed_events: dict[str, int] = {}
+        # device event time to receive, receive to entity state written
+        self.event_latency = LatencyStats()
+        self.write_latency = LatencyStats()
+        # seconds, the device time of the last event latency sample is either
+        # the LocaleTime (whole seconds) or has the UTCMS milliseconds
+        self.event_latency_resolution = 1.0
+
+    def add_keep_alive_rtt(self, rtt: float):
+        """Record a keep alive round trip in seconds."""
+        self.keep_alive_rtt = rtt
+        if self.keep_alive_rtt_ewma is None:
+            self.keep_alive_rtt_ewma = rtt
+        else:
+            self.keep_alive_rtt_ewma += self.RTT_EWMA_WEIGHT * (
+                rtt - self.keep_alive_rtt_ewma
+            )
+
+
+class FrameRecorder:
+    """Keep the last frames sent and received for diagnostics.
+
+    All storage is allocated up front, recording a frame copies at most
+    frame_bytes of the payload into its slot and allocates nothing.
+    """
+
+    RECEIVED = 0
+    SENT = 1
+
+    def __init__(
+        self, size: int = FRAME_RECORDER_SIZE, frame_bytes: int = FRAME_RECORDER_BYTES
+    ) -> None:
+        """Init."""
+        self.size = size
+        self.frame_bytes = frame_bytes
+        self.count = 0
+        self._data = bytearray(size * frame_bytes)
+        self._lengths = array("I", bytes(4 * size))
+        self._times = array("d", bytes(8 * size))
+        self._directions = bytearray(size)
+
+    def record(self, direction: int, payload):
+        """Store a frame payload, overwriting the oldest one when full."""
+        slot = self.count % self.size
+        length = len(payload)
+        kept = min(length, self.frame_bytes)
+        start = slot * self.frame_bytes
+        self._data[start : start + kept] = payload[:kept]
+        self._lengths[slot] = length
+        self._times[slot] = time.time()
+        self._directions[slot] = direction
+        self.count += 1
+
+    def frames(self) -> list[dict[str, Any]]:
+        """Return the recorded frames, oldest first.
+
+        payload is truncated to frame_bytes, length is the full frame length.
+        """
+        frames = []
+        for index in range(max(0, self.count - self.size), self.count):
+            slot = index % self.size
+            length = self._lengths[slot]
+            start = slot * self.frame_bytes
+            frames.append(
+                {
+                    "direction": "sent" if self._directions[slot] else "received",
+                    "time": self._times[slot],
+                    "length": length,
+                    "payload": bytes(
+                        self._data[start : start + min(length, self.frame_bytes)]
+                    ),
+                }
+            )
+        return frames
+
+
+class EventHistory:
+    """Recent events reported by the client, with rolling statistics.
+
+    The last size events are kept in a ring buffer of arrays for the
+    diagnostics. The statistics do not depend on it, they are counted per
+    code in buckets of window / buckets seconds, so a burst of one code does
+    not push the others out of the window. A bucket leaves the statistics
+    once it is older than the window. An on period is counted in the bucket
+    of its Stop.
+    """
+
+    def __init__(
+        self,
+        size: int = EVENT_HISTORY_SIZE,
+        window: float = EVENT_STATS_WINDOW,
+        buckets: int = EVENT_STATS_BUCKETS,
+    ) -> None:
+        """Init."""
+        self.size = size
+        self.window = window
+        self.buckets = buckets
+        self.bucket_width = window / buckets
+        self.count = 0
+        self.started = time.monotonic()
+        self._codes = bytearray(size)
+        self._starts = bytearray(size)
+        self._times = array("d", bytes(8 * size))
+        self._locale_times: list[Optional[str]] = [None] * size
+        codes = len(LOREX_DOORBELL_CODES)
+        # bucket number counted in each slot, -1 when empty, slots of a code
+        # are at index * buckets + slot
+        self._bucket_ids = array("q", [-1] * buckets)
+        self._bucket_starts = array("I", bytes(4 * codes * buckets))
+        self._bucket_periods = array("I", bytes(4 * codes * buckets))
+        self._bucket_on_time = array("d", bytes(8 * codes * buckets))
+        self._current = -1
+        self._start_count = [0] * codes
+        self._period_count = [0] * codes
+        self._on_time = [0.0] * codes
+        self._open: list[Optional[float]] = [None] * codes
+
+    def record(self, code: str, start: bool, locale_time: str, received: float):
+        """Add an event, received is its time.monotonic() receive time."""
+        index = LOREX_DOORBELL_CODES.index(code)
+        if start:
+            self._open[index] = received
+            self._count(index, received, starts=1)
+        elif self._open[index] is not None:
+            duration = received - self._open[index]
+            self._open[index] = None
+            self._count(index, received, periods=1, on_time=duration)
+
+        slot = self.count % self.size
+        self._codes[slot] = index
+        self._starts[slot] = start
+        self._times[slot] = received
+        self._locale_times[slot] = locale_time
+        self.count += 1
+
+    def _count(self, index: int, received: float, starts=0, periods=0, on_time=0.0):
+        """Add to the bucket of received for code index."""
+        self.expire(received)
+        bucket = int(received // self.bucket_width)
+        if bucket <= self._current - self.buckets:
+            # a held Stop older than the window
+            return
+        slot = bucket % self.buckets
+        self._bucket_ids[slot] = bucket
+        flat = index * self.buckets + slot
+        self._bucket_starts[flat] += starts
+        self._bucket_periods[flat] += periods
+        self._bucket_on_time[flat] += on_time
+        self._start_count[index] += starts
+        self._period_count[index] += periods
+        self._on_time[index] += on_time
+
+    def close_periods(self):
+        """Forget the open on periods, their Stop will never arrive."""
+        self._open = [None] * len(self._open)
+
+    def expire(self, now: float):
+        """Remove the buckets older than the window from the statistics."""
+        current = int(now // self.bucket_width)
+        if current <= self._current:
+            return
+        buckets = self.buckets
+        # the buckets that left the window since the last call, at most all
+        first = max(self._current - buckets + 1, current - 2 * buckets + 1, 0)
+        self._current = current
+        for bucket in range(first, current - buckets + 1):
+            slot = bucket % buckets
+            if self._bucket_ids[slot] != bucket:
+                continue
+            self._bucket_ids[slot] = -1
+            for index in range(len(self._start_count)):
+                flat = index * buckets + slot
+                self._start_count[index] -= self._bucket_starts[flat]
+                self._period_count[index] -= self._bucket_periods[flat]
+                if self._period_count[index]:
+                    self._on_time[index] -= self._bucket_on_time[flat]
+                else:
+                    # start again from 0 rather than keep the rounding errors
+                    self._on_time[index] = 0.0
+                self._bucket_starts[flat] = 0
+                self._bucket_periods[flat] = 0
+                self._bucket_on_time[flat] = 0.0
+
+    def starts(self, code: str, now: Optional[float] = None) -> int:
+        """Return the number of Start events of code in the window."""
+        self.expire(time.monotonic() if now is None else now)
+        return self._start_count[LOREX_DOORBELL_CODES.index(code)]
+
+    def duty_cycle(self, code: str, now: Optional[float] = None) -> float:
+        """Return the fraction of the window code was on."""
+        if now is None:
+            now = time.monotonic()
+        self.expire(now)
+        index = LOREX_DOORBELL_CODES.index(code)
+        on_time = self._on_time[index]
+        if self._open[index] is not None:
+            on_time += now - self._open[index]
+        # the counted buckets cover from the start of the oldest one to now
+        first = (self._current - self.buckets + 1) * self.bucket_width
+        span = now - max(first, self.started)
+        return min(1.0, on_time / span) if span > 0 else 0.0
+
+    def mean_duration(self, code: str, now: Optional[float] = None) -> Optional[float]:
+        """Return the mean length in seconds of the on periods of code."""
+        self.expire(time.monotonic() if now is None else now)
+        index = LOREX_DOORBELL_CODES.index(code)
+        if not self._period_count[index]:
+            return None
+        return self._on_time[index] / self._period_count[index]
+
+    def events(self) -> list[dict[str, Any]]:
+        """Return the events in the history, oldest first."""
+        events = []
+        for index in range(max(0, self.count - self.size), self.count):
+            slot = index % self.size
+            events.append(
+                {
+                    "code": LOREX_DOORBELL_CODES[self._codes[slot]],
+                    "action": "Start" if self._starts[slot] else "Stop",
+                    "locale_time": self._locale_times[slot],
+                    "received": self._times[slot],
+                }
+            )
+        return events
 
 
 class LorexDoorbellClient(asyncio.Protocol):
@@ -43,12 +545,20 @@ class LorexDoorbellClient(asyncio.Protocol):
     request_id: int
     session_id: int
     keep_alive_interval: int
+    keep_alive_misses: int
     realm: Optional[str]
     random: Optional[str]
+    login_failure: Optional[str]
     dahua_details: dict[str, Any]
-    hold_time: int
-    data_handlers: dict[Any, Callable[[Any, str], None]]
+    hold_time: float
+    metrics: ProtocolMetrics
+    recorder: Optional[FrameRecorder]
+    history: Optional[EventHistory]
+    clock: Optional[DeviceClock]
+    pending: dict[int, asyncio.Future]
+    notify_handlers: dict[str, Callable[[Any], None]]
     dahua_config: dict[str, Any]
+    event_codes: list[str]
     status: dict[str, Any]
 
     def __init__(self, config: dict[str, Any], on_con_lost) -> None:
@@ -57,12 +567,37 @@ class LorexDoorbellClient(asyncio.Protocol):
         self.dahua_details = {}
         self.realm = None
         self.random = None
+        # LOGIN_FAILED_CHALLENGE or LOGIN_FAILED_AUTH when start() failed there
+        self.login_failure = None
         self.request_id = 1
         self.session_id = 0
         self.keep_alive_interval = 0
+        self.keep_alive_misses = 0
+        self.keep_alive_handle = None
+        self.keep_alive_phase = config.get("keep_alive_phase", 0.0)
+        self.scheduler = config.get("scheduler")
+        # False only connects, the owner sends the requests itself
+        self.login_on_connect = config.get("login", True)
         self.transport = None
-        self.hold_time = 0
-        self.data_handlers = {}
+        self.loop = None
+        self.outbox = []
+        self.hold_time = config.get("hold_time", 0)
+        self.held_stops = {}
+        self.metrics = config.get("metrics") or ProtocolMetrics()
+        self.recorder = config.get("recorder")
+        self.history = config.get("history")
+        self.clock = config.get("clock")
+        self.pending = {}
+        self.notify_handlers = {
+            DAHUA_CLIENT_NOTIFY_EVENT_STREAM: self.handle_notify_event_stream
+        }
+        self.tasks = set()
+        self.event_codes = []
+        self.event_codes_lock = asyncio.Lock()
+        # a probe expects hosts that do not speak DHIP, they are not errors
+        self.decoder = DhipFrameDecoder(
+            logging.ERROR if self.login_on_connect else logging.DEBUG
+        )
         self.on_con_lost = on_con_lost
         self.on_event = config["on_event"]
         self.status = {}
@@ -82,34 +617,94 @@ class LorexDoorbellClient(asyncio.Protocol):
 
         try:
             self.transport = transport
+            self.loop = asyncio.get_running_loop()
+            if self.scheduler is None:
+                self.scheduler = self.loop
 
-            self.pre_login()
+            if self.login_on_connect:
+                self.create_task(self.start())
 
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
 
             _LOGGER.error(
-                f"Pre-Login failed, error: {ex}, Line: {exc_tb.tb_lineno}"
+                "Pre-Login failed, error: %s, Line: %s", ex, exc_tb.tb_lineno
             )
 
-    # overide of base calls to receive data
-    def data_received(self, data):
-        """Override of base class. called when data recieved from the server."""
+    async def start(self):
+        """Log in to the doorbell then load the device details."""
         try:
-            message = self.parse_response(data)
-            if message is not None:
-                _LOGGER.debug(f"Data received: {message}")
-                # print(f"Data: {message}\r\r")
-                message_id = message.get("id")
-                handler: Callable = self.data_handlers.get(message_id, self.handle_default)
-                handler(message)
+            # no answer or no challenge, it is not a doorbell
+            self.login_failure = LOGIN_FAILED_CHALLENGE
+            if await self.pre_login():
+                self.login_failure = None
+                if await self.login():
+                    await self.load_device_details()
+                    if self.clock is not None:
+                        self.create_task(self.async_sync_clock())
+
+                    self.status[LOREX_CLIENT] = self
+                    self.on_event(self.status)
+                    return
+                self.login_failure = LOGIN_FAILED_AUTH
+
+            _LOGGER.error("Login to doorbell failed")
 
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
 
-            _LOGGER.error(
-                f"Data_recieved, error: {ex}, Line: {exc_tb.tb_lineno}"
-            )
+            _LOGGER.error("Login failed, error: %r, Line: %s", ex, exc_tb.tb_lineno)
+
+        if not self.transport.is_closing():
+            self.transport.close()
+
+    def create_task(self, coro):
+        """Run a coroutine on the loop and keep a reference until it is done."""
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    # overide of base calls to receive data
+    def data_received(self, data):
+        """Override of base class. called when data recieved from the server."""
+        metrics = self.metrics
+        recorder = self.recorder
+        metrics.bytes_received += len(data)
+        for payload in self.decoder.feed(data):
+            metrics.frames_received += 1
+            if recorder is not None:
+                recorder.record(FrameRecorder.RECEIVED, payload)
+            if _FRAME_LOGGER.isEnabledFor(logging.DEBUG):
+                self.trace_frame("<-", payload)
+            try:
+                message = self.parse_response(payload)
+                if message is None:
+                    metrics.parse_failures += 1
+                else:
+                    if _LOGGER.isEnabledFor(logging.DEBUG):
+                        _LOGGER.debug("Data received: %s", message)
+                    self.handle_message(message)
+
+            except Exception as ex:
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+
+                _LOGGER.error(
+                    "Data_recieved, error: %s, Line: %s", ex, exc_tb.tb_lineno
+                )
+
+    def handle_message(self, message):
+        """Pass a notification to its handler or a response to its request."""
+        handler = self.notify_handlers.get(message.get("method"))
+        if handler is not None:
+            handler(message.get("params"))
+            return
+
+        future = self.pending.pop(message.get("id"), None)
+        if future is None:
+            self.handle_default(message)
+        elif not future.done():
+            future.set_result(message)
 
     def handle_notify_event_stream(self, params):
         """Process events recieved from doorbell.
@@ -117,7 +712,8 @@ class LorexDoorbellClient(asyncio.Protocol):
         then send an update to the callback with status.
         """
         try:
-            _LOGGER.debug(f"Event: {params}")
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Event: %s", params)
             event_list = params.get("eventList")
 
             for message in event_list:
@@ -128,30 +724,112 @@ class LorexDoorbellClient(asyncio.Protocol):
                 else:
                     action = message.get("Action")
                 if code in LOREX_DOORBELL_CODES:
-                    self.status[LOREX_TIME_STAMP] = data.get("LocaleTime")
-                    if action == "Start":
-                        self.status[code] = True
-                    elif action == "Stop":
-                        self.status[code] = False
-                    self.on_event(self.status)
+                    self.handle_event(
+                        code, action, data.get("LocaleTime"), data.get("UTCMS")
+                    )
 
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
 
             _LOGGER.error(
-                f"Failed to handle event, error: {ex}, Line: {exc_tb.tb_lineno}"
+                "Failed to handle event, error: %s, Line: %s", ex, exc_tb.tb_lineno
             )
 
+    def handle_event(self, code, action, locale_time, utc_ms=None):
+        """Update the status for one event and send it to the callback.
+
+        utc_ms is the millisecond part of the event time, only sent by some
+        firmware. Events that do not change the status are dropped. With a hold time a
+        Stop for the LOREX_HOLD_CODES is held back, a Start within the hold
+        time cancels it so the flap is reported as one continuous on period.
+        """
+        events = self.metrics.events
+        events[code] = events.get(code, 0) + 1
+        received = time.monotonic()
+        clock = self.clock
+        if clock is not None and clock.offset is not None:
+            device_time = parse_locale_time(locale_time)
+            if device_time is not None:
+                if isinstance(utc_ms, (int, float)):
+                    fraction = utc_ms / 1000
+                    self.metrics.event_latency_resolution = 0.001
+                else:
+                    # whole seconds, the sample is off by up to half a second
+                    fraction = None
+                    self.metrics.event_latency_resolution = 1.0
+                latency = received - clock.to_monotonic(device_time, fraction)
+                # an event can not arrive before it happened, a negative
+                # sample is the resolution or the clock estimate
+                self.metrics.event_latency.add(max(0.0, latency))
+
+        if action == "Start":
+            held = self.held_stops.pop(code, None)
+            if held is not None:
+                held[0].cancel()
+                self.suppress_event(code, 2)
+                return
+            if self.status[code]:
+                self.suppress_event(code)
+                return
+            self.status[code] = True
+        elif action == "Stop":
+            if not self.status[code] or code in self.held_stops:
+                self.suppress_event(code)
+                return
+            if self.hold_time and code in LOREX_HOLD_CODES:
+                handle = self.loop.call_later(self.hold_time, self.release_stop, code)
+                self.held_stops[code] = (handle, locale_time, received)
+                return
+            self.status[code] = False
+
+        self.report_event(code, locale_time, received)
+
+    def release_stop(self, code):
+        """Hold time passed without a new Start, report the held Stop."""
+        _, locale_time, received = self.held_stops.pop(code)
+        self.status[code] = False
+        self.report_event(code, locale_time, received)
+
+    def report_event(self, code, locale_time, received):
+        """Record an event that changed the status and send the status."""
+        if self.history is not None:
+            self.history.record(code, self.status[code], locale_time, received)
+        self.status[LOREX_TIME_STAMP] = locale_time
+        # a held Stop is released now, the write latency starts here
+        self.status[LOREX_RECEIVED] = time.monotonic()
+        self.on_event(self.status)
+
+    def suppress_event(self, code, count=1):
+        """Count events dropped by handle_event."""
+        suppressed = self.metrics.suppressed_events
+        suppressed[code] = suppressed.get(code, 0) + count
+
     def handle_default(self, message):
         """Default message handler."""
-        _LOGGER.debug(f"Lorex: Default message handler for: {message}")
+        _LOGGER.debug("Lorex: Default message handler for: %s", message)
 
     def eof_received(self):
         _LOGGER.debug("Server sent EOF message")
 
     def connection_lost(self, exc):
         """Connection lost from server."""
-        _LOGGER.error("Server closed the connection")
+        if self.login_on_connect:
+            _LOGGER.error("Server closed the connection")
+        else:
+            _LOGGER.debug("Connection closed")
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection lost"))
+        self.pending.clear()
+        if self.keep_alive_handle is not None:
+            self.keep_alive_handle.cancel()
+            self.keep_alive_handle = None
+        for code, (handle, *_) in self.held_stops.items():
+            handle.cancel()
+            self.status[code] = False
+        self.held_stops.clear()
+        if self.history is not None:
+            self.history.close_periods()
         self.status[LOREX_CONNECTION] = False
         self.on_event(self.status)
         if not self.on_con_lost.done():
@@ -164,8 +842,39 @@ class LorexDoorbellClient(asyncio.Protocol):
         if not self.on_con_lost.done():
             self.on_con_lost.set_result(True)
 
-    def send(self, action, handler, params=None):
-        """Send a command."""
+    def rebind(self, config, on_con_lost):
+        """Hand the logged in client over to a new owner.
+
+        config has the keys of __init__, the new owner's callback, counters and
+        scheduler replace the ones the client was created with, the connection
+        and session are kept. The status is sent to the new callback.
+        """
+        self.on_con_lost = on_con_lost
+        self.on_event = config["on_event"]
+        self.hold_time = config.get("hold_time", 0)
+        self.metrics = config.get("metrics") or self.metrics
+        self.recorder = config.get("recorder")
+        self.history = config.get("history")
+        self.clock = config.get("clock")
+        self.keep_alive_phase = config.get("keep_alive_phase", 0.0)
+        self.scheduler = config.get("scheduler") or self.loop
+
+        if self.transport.is_closing():
+            if not on_con_lost.done():
+                on_con_lost.set_result(True)
+            return
+
+        if self.keep_alive_handle is not None:
+            self.keep_alive_handle.cancel()
+            self.schedule_keep_alive(
+                self.keep_alive_interval * (1 - self.keep_alive_phase)
+            )
+        if self.clock is not None:
+            self.create_task(self.async_sync_clock())
+        self.on_event(self.status)
+
+    def send(self, action, params=None):
+        """Send a command and return its request id."""
         if params is None:
             params = {}
 
@@ -179,48 +888,74 @@ class LorexDoorbellClient(asyncio.Protocol):
             "params": params,
         }
 
-        self.data_handlers[self.request_id] = handler
-
         if not self.transport.is_closing():
-            message = self.convert_message(message_data)
+            header, payload = self.encode_message(message_data)
+            if _FRAME_LOGGER.isEnabledFor(logging.DEBUG):
+                self.trace_frame("->", payload)
+            self.outbox += (header, payload)
+            self.metrics.frames_sent += 1
+            self.metrics.bytes_sent += len(header) + len(payload)
+            if self.recorder is not None:
+                self.recorder.record(FrameRecorder.SENT, payload)
+            # requests sent together go out in one write on the next loop tick
+            if len(self.outbox) == 2:
+                self.loop.call_soon(self.flush)
+
+        return self.request_id
+
+    async def request(self, action, params=None, timeout=DEFAULT_REQUEST_TIMEOUT):
+        """Send a command and wait for the response message.
+
+        The request is removed from the pending table when it is answered,
+        times out or the connection is lost.
+        """
+        if self.transport is None or self.transport.is_closing():
+            raise ConnectionError("Not connected to doorbell")
 
-            self.transport.write(message)
+        future = self.loop.create_future()
+        request_id = self.send(action, params)
+        self.pending[request_id] = future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
 
     @staticmethod
-    def convert_message(data):
-        """Remove junk from data."""
-        message_data = json.dumps(data, indent=4)
-
-        header = struct.pack(">L", 0x20000000)
-        header += struct.pack(">L", 0x44484950)
-        header += struct.pack(">d", 0)
-        header += struct.pack("<L", len(message_data))
-        header += struct.pack("<L", 0)
-        header += struct.pack("<L", len(message_data))
-        header += struct.pack("<L", 0)
+    def trace_frame(direction, payload):
+        """Log a truncated summary of a frame payload."""
+        _FRAME_LOGGER.debug(
+            "%s %d bytes: %s",
+            direction,
+            len(payload),
+            bytes(payload[:FRAME_TRACE_BYTES]),
+        )
 
-        message = header + message_data.encode("utf-8")
+    def flush(self):
+        """Write all queued frames to the transport."""
+        frames, self.outbox = self.outbox, []
+        if frames and not self.transport.is_closing():
+            self.transport.writelines(frames)
 
-        return message
+    @staticmethod
+    def encode_message(data):
+        """Return the DHIP header and compact json payload for a message."""
+        payload = JSON_CODEC.dumps(data)
+        length = len(payload)
 
-    def pre_login(self):
-        """Send login to doorbell."""
-        _LOGGER.debug("Prepare pre-login message")
+        header = DHIP_HEADER_PREFIX + DHIP_HEADER_LENGTHS.pack(length, 0, length, 0)
 
-        def handle_pre_login(message):
-            error = message.get("error")
-            params = message.get("params")
-            _LOGGER.debug(f"Message: {message}")
+        return header, payload
 
-            if error is not None:
-                error_message = error.get("message")
+    @staticmethod
+    def convert_message(data):
+        """Frame a message with the DHIP header."""
+        header, payload = LorexDoorbellClient.encode_message(data)
 
-                if error_message == "Component error: login challenge!":
-                    self.random = params.get("random")
-                    self.realm = params.get("realm")
-                    self.session_id = message.get("session")
+        return header + payload
 
-                    self.login()
+    async def pre_login(self):
+        """Send login to doorbell and store the login challenge."""
+        _LOGGER.debug("Prepare pre-login message")
 
         request_data = {
             "clientType": "",
@@ -230,22 +965,23 @@ class LorexDoorbellClient(asyncio.Protocol):
             "password": "",
         }
 
-        self.send(DAHUA_GLOBAL_LOGIN, handle_pre_login, request_data)
+        message = await self.request(DAHUA_GLOBAL_LOGIN, request_data)
+        _LOGGER.debug("Message: %s", message)
 
-    def login(self):
-        """Respond to login challenge."""
-        _LOGGER.debug("Prepare login message")
+        error = message.get("error") or {}
+        if error.get("message") != DAHUA_LOGIN_CHALLENGE:
+            return False
+
+        params = message.get("params") or {}
+        self.random = params.get("random")
+        self.realm = params.get("realm")
+        self.session_id = message.get("session")
 
-        def handle_login(message):
-            params = message.get("params")
-            keep_alive_interval = params.get("keepAliveInterval")
-            _LOGGER.debug(f"Login response: {message}")
+        return True
 
-            if keep_alive_interval is not None:
-                self.keep_alive_interval = keep_alive_interval - 5
-                self.status[LOREX_CONNECTION] = True
-                Timer(self.keep_alive_interval, self.keep_alive).start()
-                self.load_version()
+    async def login(self):
+        """Respond to login challenge."""
+        _LOGGER.debug("Prepare login message")
 
         password = self._get_hashed_password(
             self.random,
@@ -263,119 +999,218 @@ class LorexDoorbellClient(asyncio.Protocol):
             "authorityType": "Default",
         }
 
-        self.send(DAHUA_GLOBAL_LOGIN, handle_login, request_data)
+        message = await self.request(DAHUA_GLOBAL_LOGIN, request_data)
+        _LOGGER.debug("Login response: %s", message)
 
-    def attach_event_manager(self):
-        """Request server send all notifications."""
-        _LOGGER.debug("Attach event manager")
+        params = message.get("params") or {}
+        keep_alive_interval = params.get("keepAliveInterval")
+        if keep_alive_interval is None:
+            return False
 
-        def handle_attach_event_manager(message):
-            method = message.get("method")
-            params = message.get("params")
+        self.keep_alive_interval = keep_alive_interval - 5
+        self.status[LOREX_CONNECTION] = True
+        # the first keep alive is offset so doorbells sharing a scheduler are
+        # spread over the interval
+        self.schedule_keep_alive(
+            self.keep_alive_interval * (1 - self.keep_alive_phase)
+        )
 
-            if method == "client.notifyEventStream":
-                self.handle_notify_event_stream(params)
+        return True
 
-        request_data = {"codes": ["All"]}
+    def attach_event_manager(self, codes=None):
+        """Request server send notifications for codes, default all we handle."""
+        if codes is None:
+            codes = LOREX_DOORBELL_CODES
         self.status[LOREX_GETTING_EVENTS] = True
-        self.send(DAHUA_EVENT_MANAGER_ATTACH, handle_attach_event_manager, request_data)
+        self.create_task(self.async_attach_event_manager(sorted(codes)))
 
-    def load_version(self):
-        _LOGGER.debug("Get version")
+    async def async_attach_event_manager(self, codes):
+        """Attach to the event manager, events arrive as notifications.
+
+        Only the difference to the existing subscription is sent, new codes
+        are attached before unused ones are detached so the codes kept never
+        miss an event. When the attach fails the doorbell would stay
+        connected without sending events, the connection is closed instead
+        so it is made again and attaches from scratch.
+        """
+        async with self.event_codes_lock:
+            if codes == self.event_codes:
+                return
+            _LOGGER.debug("Attach event manager, codes: %s", codes)
+            attach = sorted(set(codes) - set(self.event_codes))
+            detach = sorted(set(self.event_codes) - set(codes))
+
+            if attach:
+                try:
+                    message = await self.request(
+                        DAHUA_EVENT_MANAGER_ATTACH, {"codes": attach}
+                    )
+                except Exception as ex:  # noqa: BLE001
+                    message = {"error": repr(ex)}
+                if not message.get("result"):
+                    _LOGGER.error("Attach event manager failed: %s", message)
+                    self.status[LOREX_GETTING_EVENTS] = False
+                    if self.transport is not None and not self.transport.is_closing():
+                        self.transport.close()
+                    return
+                self.event_codes = sorted(set(self.event_codes) | set(attach))
+
+            if detach:
+                # a failed detach only leaves events that are dropped anyway
+                try:
+                    await self.request(DAHUA_EVENT_MANAGER_DETACH, {"codes": detach})
+                    self.event_codes = sorted(set(self.event_codes) - set(detach))
+                except Exception as ex:  # noqa: BLE001
+                    _LOGGER.error("Detach event manager failed, error: %r", ex)
+
+    async def load_device_details(self):
+        """Load version, device type and serial number.
+
+        The requests are independent so they are sent together and share one
+        round trip.
+        """
+        await asyncio.gather(
+            self.load_version(), self.load_device_type(), self.load_serial_number()
+        )
 
-        def handle_version(message):
-            params = message.get("params")
-            version_details = params.get("version", {})
-            build_date = version_details.get("BuildDate")
-            version = version_details.get("Version")
+    async def load_version(self):
+        _LOGGER.debug("Get version")
 
-            self.dahua_details[DAHUA_VERSION] = version
-            self.dahua_details[DAHUA_BUILD_DATE] = build_date
+        message = await self.request(DAHUA_MAGICBOX_GETSOFTWAREVERSION)
+        params = message.get("params") or {}
+        version_details = params.get("version", {})
+        build_date = version_details.get("BuildDate")
+        version = version_details.get("Version")
 
-            _LOGGER.debug(f"Version: {version}, Build Date: {build_date}")
-            # call next item
-            self.load_device_type()
+        self.dahua_details[DAHUA_VERSION] = version
+        self.dahua_details[DAHUA_BUILD_DATE] = build_date
 
-        self.send(DAHUA_MAGICBOX_GETSOFTWAREVERSION, handle_version)
+        _LOGGER.debug("Version: %s, Build Date: %s", version, build_date)
 
-    def load_device_type(self):
+    async def load_device_type(self):
         _LOGGER.debug("Get device type")
 
-        def handle_device_type(message):
-            params = message.get("params")
-            device_type = params.get("type")
-
-            self.dahua_details[DAHUA_DEVICE_TYPE] = device_type
-            self.status[LOREX_MODEL] = device_type
+        message = await self.request(DAHUA_MAGICBOX_GETDEVICETYPE)
+        params = message.get("params") or {}
+        device_type = params.get("type")
 
-            _LOGGER.debug(f"Device Type: {device_type}")
-            self.load_serial_number()
+        self.dahua_details[DAHUA_DEVICE_TYPE] = device_type
+        self.status[LOREX_MODEL] = device_type
 
-        self.send(DAHUA_MAGICBOX_GETDEVICETYPE, handle_device_type)
+        _LOGGER.debug("Device Type: %s", device_type)
 
-    def load_serial_number(self):
+    async def load_serial_number(self):
         _LOGGER.debug("Get serial number")
 
-        def handle_serial_number(message):
-            params = message.get("params")
-            table = params.get("table", {})
-            serial_number = table.get("UUID")
+        request_data = {"name": "T2UServer"}
 
-            self.dahua_details[DAHUA_SERIAL_NUMBER] = serial_number
-            self.status[LOREX_ID] = serial_number
+        message = await self.request(DAHUA_CONFIG_MANAGER_GETCONFIG, request_data)
+        params = message.get("params") or {}
+        table = params.get("table", {})
+        serial_number = table.get("UUID")
 
-            _LOGGER.debug(f"Serial Number: {serial_number}")
-            _LOGGER.debug(f"config: {message}")
-            self.status[LOREX_CLIENT] = self
-            self.on_event(self.status)
-            # self.attach_event_manager()
+        self.dahua_details[DAHUA_SERIAL_NUMBER] = serial_number
+        self.status[LOREX_ID] = serial_number
 
-        request_data = {"name": "T2UServer"}
+        _LOGGER.debug("Serial Number: %s", serial_number)
+        _LOGGER.debug("config: %s", message)
 
-        self.send(DAHUA_CONFIG_MANAGER_GETCONFIG, handle_serial_number, request_data)
+    def schedule_keep_alive(self, delay):
+        """Schedule the next keep alive on the scheduler, default the event loop."""
+        self.keep_alive_handle = self.scheduler.call_later(delay, self.keep_alive)
 
     def keep_alive(self):
-        _LOGGER.debug("Keep alive")
+        """Loop callback, send the keep alive."""
+        self.keep_alive_handle = None
+        self.create_task(self.async_keep_alive())
 
-        def handle_keep_alive(message):
-            Timer(self.keep_alive_interval, self.keep_alive).start()
+    async def async_keep_alive(self):
+        """Send a keep alive and count the ones the doorbell does not answer.
 
-        request_data = {"timeout": self.keep_alive_interval, "action": True}
+        After KEEP_ALIVE_MAX_MISSES unanswered keep alives the connection is
+        dropped so the doorbell is reconnected.
+        """
+        _LOGGER.debug("Keep alive")
 
-        self.send(DAHUA_GLOBAL_KEEPALIVE, handle_keep_alive, request_data)
+        request_data = {"timeout": self.keep_alive_interval, "action": True}
+        # sampled alongside, both requests go out in the same write
+        if self.clock is not None:
+            self.create_task(self.async_sync_clock())
 
-    def config(self):
+        sent = self.loop.time()
+        try:
+            await self.request(
+                DAHUA_GLOBAL_KEEPALIVE, request_data, timeout=KEEP_ALIVE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            self.keep_alive_misses += 1
+            _LOGGER.warning(
+                "Keep alive not answered, %s of %s",
+                self.keep_alive_misses,
+                KEEP_ALIVE_MAX_MISSES,
+            )
+            if self.keep_alive_misses >= KEEP_ALIVE_MAX_MISSES:
+                _LOGGER.error("Doorbell not responding, closing the connection")
+                self.transport.abort()
+            else:
+                self.schedule_keep_alive(KEEP_ALIVE_RETRY_INTERVAL)
+            return
+        except ConnectionError:
+            return
+
+        self.metrics.add_keep_alive_rtt(self.loop.time() - sent)
+        self.keep_alive_misses = 0
+        self.schedule_keep_alive(self.keep_alive_interval)
+
+    async def async_sync_clock(self):
+        """Read the device time and add it to the clock estimate."""
+        clock = self.clock
+        sent = time.monotonic()
+        try:
+            message = await self.request(
+                DAHUA_GLOBAL_GETCURRENTTIME, timeout=KEEP_ALIVE_TIMEOUT
+            )
+        except (asyncio.TimeoutError, ConnectionError):
+            return
+        received = time.monotonic()
+
+        params = message.get("params") or {}
+        device_time = parse_locale_time(params.get("time"))
+        if device_time is None:
+            # not supported, do not ask again on this connection
+            _LOGGER.debug("Device time not available: %s", message)
+            self.clock = None
+            return
+        clock.add_sample(device_time, sent, received)
+
+    async def config(self):
         _LOGGER.debug("Getting config")
 
-        def handle_config(message):
-            _LOGGER.debug(f"Config: {message}")
-            self.attach_event_manager()
-
         request_data = {}
 
-        self.send(DAHUA_MAGICBOX_GETSYSINFO, handle_config, request_data)
+        message = await self.request(DAHUA_MAGICBOX_GETSYSINFO, request_data)
+        _LOGGER.debug("Config: %s", message)
+        self.attach_event_manager()
 
     @staticmethod
-    def parse_response(response):
-        """Convert received data to json."""
+    def parse_response(payload):
+        """Convert the payload of a single frame to json.
+
+        The payload is decoded straight from the receive buffer.
+        """
         result = None
 
         try:
-            response_parts = str(response).split("\\x00")
-            for response_part in response_parts:
-                if response_part.startswith("{") and  response_part.__contains__('}'):
-                    end = response_part.rindex("}") + 1
-                    message = response_part[0:end]
-
-                    result = json.loads(message)
-                    if len(result):
-                        break
+            result = JSON_CODEC.loads(payload)
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
 
             _LOGGER.error(
-                f"Failed to parse response: {response}, error: {e}, Line: {exc_tb.tb_lineno}"
+                "Failed to parse response: %s, error: %s, Line: %s",
+                bytes(payload[:FRAME_TRACE_BYTES]),
+                e,
+                exc_tb.tb_lineno,
             )
 
         return result
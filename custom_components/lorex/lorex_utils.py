@@ -1,58 +1,67 @@
 """Lorex utility functions and Enum classes."""
 
-import socket
+import asyncio
+import logging
 
-from .const import LorexType
+from .const import PROBE_TIMEOUT, LorexType
 
+_LOGGER = logging.getLogger(__name__)
 
-def determine_type(host_ip) -> int:
-    """Try different ports to determine lor_typ.
+# port open on each type of device in the order they decide, 5000 is only
+# open on doorbells
+PROBE_PORTS = (
+    (5000, LorexType.DOORBELL),
+    (8086, LorexType.IPCAMERA),
+    (554, LorexType.DVR),
+)
 
-    port 5000 only open on doorbells.
-    """
-    lor_typ: int
-    lor_typ = 0
-    # creates a new socket
-    s = socket.socket()
+# types found so far, by host
+_lorex_types: dict[str, LorexType] = {}
+
+
+async def _port_open(host_ip: str, port: int, timeout: float) -> bool:
+    """Return True if a connection to the port is accepted within timeout."""
     try:
-        # tries to connect to host using that port
-        s.connect((host_ip, 5000))
-        # make timeout if you want it a little faster ( less accuracy )
-        # s.settimeout(0.2)
-    except:
-        # cannot connect, port is closed
-        # return false
-        lor_typ = 0
-    else:
-        # the connection was established, port is open!
-        lor_typ = LorexType.DOORBELL
-    if lor_typ:
-        return lor_typ
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host_ip, port), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+    writer.close()
     try:
-        # tries to connect to host using that port
-        s.connect(host_ip, 8086)
-        # make timeout if you want it a little faster ( less accuracy )
-        # s.settimeout(0.2)
-    except:
-        # cannot connect, port is closed
-        # return false
-        lor_typ = 0
-    else:
-        # the connection was established, port is open!
-        lor_typ = LorexType.IPCAMERA
-    if lor_typ:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def determine_type(host_ip: str, timeout: float = PROBE_TIMEOUT) -> LorexType:
+    """Try different ports to determine the LorexType of a host.
+
+    All ports are probed at once, the first open port in PROBE_PORTS order
+    decides and the remaining probes are cancelled. A host that is not found
+    is not cached so it is probed again next time.
+    """
+    lor_typ = _lorex_types.get(host_ip)
+    if lor_typ is not None:
         return lor_typ
+
+    probes = [
+        asyncio.create_task(_port_open(host_ip, port, timeout))
+        for port, _ in PROBE_PORTS
+    ]
+    lor_typ = LorexType.UNKNOWN
     try:
-        # tries to connect to host using that port
-        s.connect((host_ip, 554))
-        # make timeout if you want it a little faster ( less accuracy )
-        # s.settimeout(0.2)
-    except:
-        # cannot connect, port is closed
-        # return false
-        lor_typ = 0
-    else:
-        # the connection was established, port is open!
-        lor_typ = LorexType.DVR
-    s.close()
+        for probe, (_, port_type) in zip(probes, PROBE_PORTS):
+            if await probe:
+                lor_typ = port_type
+                break
+    finally:
+        for probe in probes:
+            probe.cancel()
+
+    _LOGGER.debug("Host %s is %s", host_ip, lor_typ)
+    if lor_typ is not LorexType.UNKNOWN:
+        _lorex_types[host_ip] = lor_typ
     return lor_typ
@@ -0,0 +1,275 @@
+"""Sensors.
+
+Statistics of the recent doorbell events and diagnostic protocol counters
+of the connection, polled so a busy doorbell does not write state on every
+frame.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .__init__ import LorexCoordinator
+from .const import ALARMLOCAL, CONF_NAME, DOMAIN, LOREX_ID, VIDEOMOTION
+from .lorex_doorbell_client import LatencyStats
+
+# the values are read from memory, reading them this often is cheap
+SCAN_INTERVAL = timedelta(seconds=30)
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+
+def _ms(seconds: float | None) -> float | None:
+    """Seconds in milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _percent(fraction: float) -> float:
+    """Fraction as a percentage."""
+    return round(fraction * 100, 1)
+
+
+def _seconds(duration: float | None) -> float | None:
+    """Duration rounded to tenths of a second."""
+    return None if duration is None else round(duration, 1)
+
+
+def _latency_ms(stats: LatencyStats) -> float | None:
+    """Median latency in milliseconds."""
+    (median,) = stats.percentiles(0.5)
+    return _ms(median)
+
+
+def _handlers(lorex: LorexCoordinator) -> int | None:
+    """Requests waiting for an answer plus the notification handlers."""
+    if lorex.client is None:
+        return None
+    return len(lorex.client.pending) + len(lorex.client.notify_handlers)
+
+
+@dataclass(frozen=True, kw_only=True)
+class LorexSensorDescription(SensorEntityDescription):
+    """Sensor description with the function reading its value."""
+
+    value_fn: Callable[[LorexCoordinator], Any]
+    entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    # event codes value_fn reads from the history, requested from the doorbell
+    codes: tuple[str, ...] = ()
+
+
+SENSORS: tuple[LorexSensorDescription, ...] = (
+    LorexSensorDescription(
+        key="presses_per_hour",
+        name="presses per hour",
+        native_unit_of_measurement="presses/h",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=None,
+        codes=(ALARMLOCAL,),
+        value_fn=lambda lorex: lorex.history.starts(ALARMLOCAL),
+    ),
+    LorexSensorDescription(
+        key="motion_duty_cycle",
+        name="motion duty cycle",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=None,
+        codes=(VIDEOMOTION,),
+        value_fn=lambda lorex: _percent(lorex.history.duty_cycle(VIDEOMOTION)),
+    ),
+    LorexSensorDescription(
+        key="mean_motion_duration",
+        name="mean motion duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=None,
+        codes=(VIDEOMOTION,),
+        value_fn=lambda lorex: _seconds(lorex.history.mean_duration(VIDEOMOTION)),
+    ),
+    LorexSensorDescription(
+        key="frames_received",
+        name="frames received",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: lorex.metrics.frames_received,
+    ),
+    LorexSensorDescription(
+        key="bytes_received",
+        name="bytes received",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: lorex.metrics.bytes_received,
+    ),
+    LorexSensorDescription(
+        key="frames_sent",
+        name="frames sent",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: lorex.metrics.frames_sent,
+    ),
+    LorexSensorDescription(
+        key="bytes_sent",
+        name="bytes sent",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: lorex.metrics.bytes_sent,
+    ),
+    LorexSensorDescription(
+        key="parse_failures",
+        name="parse failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda lorex: lorex.metrics.parse_failures,
+    ),
+    LorexSensorDescription(
+        key="handlers",
+        name="handlers",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: _handlers(lorex),
+    ),
+    LorexSensorDescription(
+        key="keep_alive_rtt",
+        name="keep alive round trip",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda lorex: _ms(lorex.metrics.keep_alive_rtt),
+    ),
+    LorexSensorDescription(
+        key="keep_alive_rtt_average",
+        name="keep alive round trip average",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda lorex: _ms(lorex.metrics.keep_alive_rtt_ewma),
+    ),
+    LorexSensorDescription(
+        key="event_latency",
+        name="event latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda lorex: _latency_ms(lorex.metrics.event_latency),
+    ),
+    LorexSensorDescription(
+        key="write_latency",
+        name="state write latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda lorex: _latency_ms(lorex.metrics.write_latency),
+    ),
+    LorexSensorDescription(
+        key="clock_drift",
+        name="clock drift",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda lorex: _seconds(lorex.clock.drift()),
+    ),
+    LorexSensorDescription(
+        key="reconnects",
+        name="reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda lorex: lorex.metrics.reconnects,
+    ),
+    LorexSensorDescription(
+        key="events",
+        name="events",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda lorex: sum(lorex.metrics.events.values()),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Statistics and diagnostic sensor setup."""
+    lorex_coord: LorexCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    if lorex_coord:
+        async_add_entities(
+            LorexSensor(entry, lorex_coord, description)
+            for description in SENSORS
+        )
+
+
+class LorexSensor(SensorEntity):
+    """Event statistic or protocol counter of the doorbell."""
+
+    entity_description: LorexSensorDescription
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        lorex_coordinator: LorexCoordinator,
+        description: LorexSensorDescription,
+    ) -> None:
+        """Init."""
+        self.entity_description = description
+        self._coordinator = lorex_coordinator
+        self._attr_should_poll = True
+        self._attr_unique_id = f"{lorex_coordinator.data[LOREX_ID]}_{description.key}"
+        self._attr_name = f"{entry.data[CONF_NAME]} {description.name}"
+
+    async def async_added_to_hass(self):
+        """Keep the events the statistics are made of coming."""
+        if self.entity_description.codes:
+            self._coordinator.add_event_codes(self, self.entity_description.codes)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Entity being removed from hass."""
+        self._coordinator.remove_event_codes(self)
+
+    @property
+    def native_value(self):
+        """Read the value."""
+        return self.entity_description.value_fn(self._coordinator)
+
+    @property
+    def extra_state_attributes(self):
+        """Per code counts, latency percentiles and the drift flag."""
+        metrics = self._coordinator.metrics
+        key = self.entity_description.key
+        if key == "events":
+            return {
+                "events": dict(metrics.events),
+                "suppressed_events": dict(metrics.suppressed_events),
+            }
+        if key in ("event_latency", "write_latency"):
+            stats = getattr(metrics, key)
+            p50, p95, p99 = stats.percentiles(0.5, 0.95, 0.99)
+            attributes = {"p50": _ms(p50), "samples": min(stats.count, stats.size)}
+            if key == "event_latency":
+                resolution = metrics.event_latency_resolution
+                attributes["resolution"] = _ms(resolution)
+                if resolution >= 1:
+                    # with whole second event times the tail is the rounding
+                    # of the time, not the latency
+                    return attributes
+            attributes["p95"] = _ms(p95)
+            attributes["p99"] = _ms(p99)
+            return attributes
+        if key == "clock_drift":
+            return {"drifting": self._coordinator.clock.drifting}
+        return None
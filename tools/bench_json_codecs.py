@@ -0,0 +1,39 @@
+"""Compare the parse cost of a notifyEventStream frame for each json backend.
+
+    python tools/bench_json_codecs.py
+"""
+
+import timeit
+
+from integration import load_package
+from payloads import NOTIFY_EVENT_STREAM
+
+load_package()
+
+from lorex.lorex_doorbell_client import (  # noqa: E402
+    JSON_CODEC,
+    JSON_CODECS,
+    load_json_codec,
+)
+
+
+def main() -> None:
+    """Time decoding a memoryview payload with every installed backend."""
+    payload = memoryview(load_json_codec("json").dumps(NOTIFY_EVENT_STREAM))
+
+    print(f"Default backend: {JSON_CODEC.name}, payload: {len(payload)} bytes")
+    for name in JSON_CODECS:
+        try:
+            codec = load_json_codec(name)
+        except ImportError:
+            print(f"{name:>8}: not installed")
+            continue
+
+        timer = timeit.Timer(lambda codec=codec: codec.loads(payload))
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number
+        print(f"{name:>8}: {best * 1e6:8.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Micro-benchmarks for the protocol hot paths.
+
+Times parse_response, convert_message, _get_hashed_password,
+handle_notify_event_stream, FrameRecorder.record, EventHistory.record and
+LorexCoordinator.on_event on the payloads in payloads.py, which are modelled
+on doorbell traffic rather than captured. Results can be saved as json
+and compared between releases:
+
+    python tools/bench_protocol.py --output bench-0.1.0.json
+    python tools/bench_protocol.py --compare bench-0.1.0.json
+
+LorexCoordinator.on_event needs Home Assistant installed, it is skipped
+otherwise.
+"""
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import json
+import platform
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+
+from integration import load_integration, load_package
+from payloads import (
+    GET_CONFIG_DUMP,
+    KEEP_ALIVE_REPLY,
+    KEEP_ALIVE_REQUEST,
+    NOTIFY_EVENT_STOP,
+    NOTIFY_EVENT_STREAM,
+)
+
+load_package()
+
+from lorex.const import (  # noqa: E402
+    ALARMLOCAL,
+    INTELLIFRAME,
+    LOREX_CONNECTION,
+    LOREX_GETTING_EVENTS,
+    LOREX_ID,
+    VIDEOMOTION,
+)
+from lorex.lorex_doorbell_client import (  # noqa: E402
+    JSON_CODEC,
+    DhipFrameDecoder,
+    EventHistory,
+    FrameRecorder,
+    LorexDoorbellClient,
+)
+
+BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a function returning the callable to time."""
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _payload(message: dict) -> memoryview:
+    """Return the frame payload of a message as the decoder yields it."""
+    return memoryview(LorexDoorbellClient.encode_message(message)[1])
+
+
+@benchmark("parse_response keep alive reply")
+def bench_parse_keep_alive():
+    payload = _payload(KEEP_ALIVE_REPLY)
+    return lambda: LorexDoorbellClient.parse_response(payload)
+
+
+@benchmark("parse_response notifyEventStream")
+def bench_parse_event_stream():
+    payload = _payload(NOTIFY_EVENT_STREAM)
+    return lambda: LorexDoorbellClient.parse_response(payload)
+
+
+@benchmark("parse_response getConfig dump")
+def bench_parse_get_config():
+    payload = _payload(GET_CONFIG_DUMP)
+    return lambda: LorexDoorbellClient.parse_response(payload)
+
+
+@benchmark("decode and parse 8 notifyEventStream frames")
+def bench_decode_frames():
+    data = LorexDoorbellClient.convert_message(NOTIFY_EVENT_STREAM) * 8
+    decoder = DhipFrameDecoder()
+
+    def run():
+        for payload in decoder.feed(data):
+            LorexDoorbellClient.parse_response(payload)
+
+    return run
+
+
+@benchmark("FrameRecorder.record notifyEventStream frame")
+def bench_record_frame():
+    payload = _payload(NOTIFY_EVENT_STREAM)
+    recorder = FrameRecorder()
+    return lambda: recorder.record(FrameRecorder.RECEIVED, payload)
+
+
+@benchmark("EventHistory.record Start/Stop pair, full history")
+def bench_event_history():
+    history = EventHistory()
+    received = 0.0
+    for _ in range(history.size):
+        history.record(VIDEOMOTION, True, "2024-05-01 12:00:00", received)
+        received += 1.0
+
+    def run():
+        nonlocal received
+        history.record(VIDEOMOTION, True, "2024-05-01 12:00:00", received)
+        history.record(VIDEOMOTION, False, "2024-05-01 12:00:01", received + 0.5)
+        received += 1.0
+
+    return run
+
+
+@benchmark("convert_message keep alive request")
+def bench_convert_keep_alive():
+    return lambda: LorexDoorbellClient.convert_message(KEEP_ALIVE_REQUEST)
+
+
+@benchmark("_get_hashed_password")
+def bench_hashed_password():
+    return lambda: LorexDoorbellClient._get_hashed_password(
+        "1234567890", "Login to 8F0A2C4PAJ9C1D5", "admin", "password"
+    )
+
+
+@benchmark("handle_notify_event_stream Start/Stop pair")
+def bench_notify_event_stream():
+    client = LorexDoorbellClient({"on_event": lambda status: None}, None)
+    start = NOTIFY_EVENT_STREAM["params"]
+    stop = NOTIFY_EVENT_STOP["params"]
+
+    def run():
+        client.handle_notify_event_stream(start)
+        client.handle_notify_event_stream(stop)
+
+    return run
+
+
+@benchmark("LorexCoordinator.on_event Start/Stop pair")
+def bench_coordinator_on_event():
+    from homeassistant.core import HomeAssistant  # noqa: PLC0415
+
+    LorexCoordinator = load_integration().LorexCoordinator
+
+    async def create():
+        hass = HomeAssistant(tempfile.mkdtemp())
+        entry = SimpleNamespace(
+            entry_id="bench",
+            data={
+                "host": "127.0.0.1",
+                "username": "admin",
+                "password": "password",
+                "name": "Lorex",
+                "port": 5000,
+            },
+            options={},
+        )
+        return LorexCoordinator(hass, entry)
+
+    coordinator = asyncio.run(create())
+    for code in (ALARMLOCAL, INTELLIFRAME, VIDEOMOTION):
+        coordinator.entity_callbacks[lambda: None] = frozenset(
+            (code, LOREX_CONNECTION)
+        )
+    status = dict(coordinator.data)
+    status.update({LOREX_CONNECTION: True, LOREX_GETTING_EVENTS: True, LOREX_ID: "1"})
+    start = {**status, VIDEOMOTION: True}
+    stop = {**status, VIDEOMOTION: False}
+
+    def run():
+        coordinator.on_event(start)
+        coordinator.on_event(stop)
+
+    return run
+
+
+def run_benchmarks(repeat: int) -> dict[str, float]:
+    """Return the best time per call in microseconds for every benchmark."""
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        try:
+            func = setup()
+        except ImportError as ex:
+            print(f"{name:<48} skipped, {ex}")
+            continue
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = best * 1e6
+        print(f"{name:<48} {results[name]:10.2f} us")
+    return results
+
+
+def compare(results: dict[str, float], baseline_file: str) -> None:
+    """Print the change of every result against a saved run."""
+    with open(baseline_file, encoding="utf-8") as file:
+        baseline = json.load(file)
+    print(f"\nCompared with {baseline_file} ({baseline['json_backend']}):")
+    for name, value in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<48} new")
+        else:
+            print(f"{name:<48} {old:10.2f} -> {value:10.2f} us ({value / old:.2f}x)")
+
+
+def main() -> None:
+    """Parse arguments and run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="save the results to this json file")
+    parser.add_argument("--compare", help="compare with results saved by --output")
+    args = parser.parse_args()
+
+    print(f"Python {platform.python_version()}, json backend {JSON_CODEC.name}")
+    results = run_benchmarks(args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "json_backend": JSON_CODEC.name,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
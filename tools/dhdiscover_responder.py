@@ -0,0 +1,112 @@
+"""Stand-in for doorbells answering Dahua DHDiscover searches.
+
+Answers every DHDiscover.search frame with one client.notifyDevInfo frame
+per simulated device, sent back to the searching address. Use a free port
+to run it next to real devices:
+
+    python tools/dhdiscover_responder.py --devices 3 --port 37811
+
+With --scan it also runs the integration's discovery against itself and
+prints what was found:
+
+    python tools/dhdiscover_responder.py --devices 3 --port 37811 --scan
+"""
+
+import argparse
+import asyncio
+import time
+
+from integration import load_package
+
+load_package()
+
+from lorex.const import (  # noqa: E402
+    DAHUA_CLIENT_NOTIFY_DEV_INFO,
+    DAHUA_DHDISCOVER_SEARCH,
+    DHDISCOVER_PORT,
+    DHIP_HEADER_SIZE,
+)
+from lorex.discovery import async_discover  # noqa: E402
+from lorex.lorex_doorbell_client import (  # noqa: E402
+    DHIP_HEADER,
+    LorexDoorbellClient,
+)
+
+
+class DHDiscoverResponder(asyncio.DatagramProtocol):
+    """Answer searches for the simulated devices."""
+
+    def __init__(self, devices: int, address: str) -> None:
+        """Init, address is the IPv4Address the devices report."""
+        self.answers = [
+            LorexDoorbellClient.convert_message(
+                {
+                    "method": DAHUA_CLIENT_NOTIFY_DEV_INFO,
+                    "params": {
+                        "deviceInfo": {
+                            "DeviceType": "B451AJD",
+                            "SerialNo": f"SIM{index:05d}",
+                            "Mac": f"02:00:00:00:00:{index:02x}",
+                            "IPv4Address": {"IPAddress": address},
+                            "Port": 37777,
+                            "Vendor": "Lorex",
+                        }
+                    },
+                }
+            )
+            for index in range(devices)
+        ]
+        self.transport = None
+
+    def connection_made(self, transport):
+        """Init connection."""
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        """Answer a search."""
+        if len(data) < DHIP_HEADER_SIZE:
+            return
+        length = DHIP_HEADER.unpack_from(data)[3]
+        message = LorexDoorbellClient.parse_response(
+            data[DHIP_HEADER_SIZE : DHIP_HEADER_SIZE + length]
+        )
+        if message and message.get("method") == DAHUA_DHDISCOVER_SEARCH:
+            for answer in self.answers:
+                self.transport.sendto(answer, addr)
+
+
+async def run(devices: int, host: str, port: int, scan: bool):
+    """Serve the responder, or search it once with --scan."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: DHDiscoverResponder(devices, "127.0.0.1"), local_addr=(host, port)
+    )
+    print(f"Answering DHDiscover searches on {host}:{port} for {devices} devices")
+    try:
+        if not scan:
+            await asyncio.Event().wait()
+        start = time.perf_counter()
+        found = await async_discover(timeout=0.5, targets=(("127.0.0.1", port),))
+        for device in found:
+            print(device)
+        print(f"Found {len(found)} devices in {time.perf_counter() - start:.2f} s")
+    finally:
+        transport.close()
+
+
+def main() -> None:
+    """Parse arguments and run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DHDISCOVER_PORT)
+    parser.add_argument("--scan", action="store_true", help="search once and exit")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.devices, args.host, args.port, args.scan))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Simulated Lorex doorbells speaking DHIP, with a load driver.
+
+Each simulated doorbell answers the login challenge, keep alives, the
+current time and the device detail requests, and once the event manager is attached pushes
+client.notifyEventStream events at a fixed rate.
+
+Run the driver, which connects one LorexDoorbellClient per simulated doorbell
+and reports event to callback latency and sustained events per second:
+
+    python tools/dhip_simulator.py --devices 20 --rate 50 --duration 10
+
+Or only serve the doorbells, for example to add them to Home Assistant:
+
+    python tools/dhip_simulator.py --serve --devices 2 --port 5000
+"""
+
+import argparse
+import asyncio
+from collections import deque
+import itertools
+import logging
+import time
+
+from integration import load_package
+
+load_package()
+
+from lorex.const import (  # noqa: E402
+    DAHUA_CLIENT_NOTIFY_EVENT_STREAM,
+    DAHUA_CONFIG_MANAGER_GETCONFIG,
+    DAHUA_EVENT_MANAGER_ATTACH,
+    DAHUA_EVENT_MANAGER_DETACH,
+    DAHUA_GLOBAL_GETCURRENTTIME,
+    DAHUA_GLOBAL_KEEPALIVE,
+    DAHUA_GLOBAL_LOGIN,
+    DAHUA_LOGIN_CHALLENGE,
+    DAHUA_MAGICBOX_GETDEVICETYPE,
+    DAHUA_MAGICBOX_GETSOFTWAREVERSION,
+    DAHUA_MAGICBOX_GETSYSINFO,
+    LOREX_CONNECTION,
+    LOREX_ID,
+    VIDEOMOTION,
+)
+from lorex.lorex_doorbell_client import (  # noqa: E402
+    DhipFrameDecoder,
+    LorexDoorbellClient,
+)
+
+USERNAME = "admin"
+PASSWORD = "password"
+REALM = "Login to simulated doorbell"
+KEEP_ALIVE_INTERVAL = 60
+SESSION_IDS = itertools.count(1000)
+
+
+class SimulatedDoorbell(asyncio.Protocol):
+    """One client connection to a simulated doorbell."""
+
+    def __init__(self, serial_number: str, rate: float, sent: deque) -> None:
+        """Init, sent receives the perf_counter time of every pushed event."""
+        self.serial_number = serial_number
+        self.rate = rate
+        self.sent = sent
+        self.session_id = 0
+        self.random = ""
+        self.decoder = DhipFrameDecoder()
+        self.transport = None
+        self.events_task = None
+
+    def connection_made(self, transport):
+        """Init connection."""
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        """Stop pushing events."""
+        if self.events_task is not None:
+            self.events_task.cancel()
+
+    def data_received(self, data):
+        """Answer every complete request."""
+        for payload in self.decoder.feed(data):
+            self.handle_request(LorexDoorbellClient.parse_response(payload))
+
+    def reply(self, message):
+        """Send a frame to the client."""
+        self.transport.write(LorexDoorbellClient.convert_message(message))
+
+    def handle_request(self, request):
+        """Build the response the doorbell would send."""
+        method = request.get("method")
+        params = request.get("params") or {}
+        response = {"id": request.get("id"), "session": self.session_id}
+
+        if method == DAHUA_GLOBAL_LOGIN and not params.get("password"):
+            self.session_id = next(SESSION_IDS)
+            self.random = f"{self.session_id:08x}"
+            response["session"] = self.session_id
+            response["error"] = {"code": 268632079, "message": DAHUA_LOGIN_CHALLENGE}
+            response["params"] = {
+                "authorization": "",
+                "encryption": "Default",
+                "random": self.random,
+                "realm": REALM,
+            }
+        elif method == DAHUA_GLOBAL_LOGIN:
+            expected = LorexDoorbellClient._get_hashed_password(
+                self.random, REALM, USERNAME, PASSWORD
+            )
+            if params.get("password") == expected:
+                response["result"] = True
+                response["params"] = {"keepAliveInterval": KEEP_ALIVE_INTERVAL}
+            else:
+                response["result"] = False
+                response["error"] = {"code": 268632085, "message": "Invalid password"}
+        elif method == DAHUA_GLOBAL_KEEPALIVE:
+            response["result"] = True
+            response["params"] = {"timeout": KEEP_ALIVE_INTERVAL}
+        elif method == DAHUA_GLOBAL_GETCURRENTTIME:
+            response["result"] = True
+            response["params"] = {"time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        elif method == DAHUA_MAGICBOX_GETSOFTWAREVERSION:
+            response["result"] = True
+            response["params"] = {
+                "version": {"BuildDate": "2024-01-01", "Version": "2.800.0000000.1.R"}
+            }
+        elif method == DAHUA_MAGICBOX_GETDEVICETYPE:
+            response["result"] = True
+            response["params"] = {"type": "B451AJD"}
+        elif method == DAHUA_MAGICBOX_GETSYSINFO:
+            response["result"] = True
+            response["params"] = {"deviceType": "B451AJD"}
+        elif method == DAHUA_CONFIG_MANAGER_GETCONFIG:
+            response["result"] = True
+            response["params"] = {"table": {"Enable": True, "UUID": self.serial_number}}
+        elif method == DAHUA_EVENT_MANAGER_ATTACH:
+            response["result"] = True
+            response["params"] = {"SID": 513}
+            if self.events_task is None and self.rate > 0:
+                loop = asyncio.get_running_loop()
+                self.events_task = loop.create_task(self.push_events(request["id"]))
+        elif method == DAHUA_EVENT_MANAGER_DETACH:
+            response["result"] = True
+            if self.events_task is not None:
+                self.events_task.cancel()
+                self.events_task = None
+        else:
+            response["result"] = False
+            response["error"] = {"code": 268894210, "message": "Method not found"}
+
+        self.reply(response)
+
+    async def push_events(self, attach_id):
+        """Push alternating VideoMotion Start and Stop events at the rate."""
+        interval = 1 / self.rate
+        action = "Start"
+        next_time = time.perf_counter()
+        while not self.transport.is_closing():
+            self.sent.append(time.perf_counter())
+            self.reply(
+                {
+                    "id": attach_id,
+                    "method": DAHUA_CLIENT_NOTIFY_EVENT_STREAM,
+                    "params": {
+                        "SID": 513,
+                        "eventList": [
+                            {
+                                "Action": action,
+                                "Code": VIDEOMOTION,
+                                "Data": {
+                                    "LocaleTime": time.strftime("%Y-%m-%d %H:%M:%S"),
+                                    "UTC": time.time(),
+                                },
+                                "Index": 0,
+                            }
+                        ],
+                    },
+                    "session": self.session_id,
+                }
+            )
+            action = "Stop" if action == "Start" else "Start"
+            next_time += interval
+            await asyncio.sleep(max(0, next_time - time.perf_counter()))
+
+
+async def start_doorbells(devices: int, rate: float, host="127.0.0.1", port=0):
+    """Start simulated doorbells, return their servers and sent time queues.
+
+    With port 0 every doorbell gets a free port, otherwise consecutive ports.
+    """
+    loop = asyncio.get_running_loop()
+    doorbells = []
+    for index in range(devices):
+        sent = deque()
+        serial_number = f"SIM{index:05d}"
+        server = await loop.create_server(
+            lambda serial_number=serial_number, sent=sent: SimulatedDoorbell(
+                serial_number, rate, sent
+            ),
+            host,
+            port + index if port else 0,
+        )
+        doorbells.append((server, sent))
+    return doorbells
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return the value at fraction of the sorted values."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def drive(devices: int, rate: float, duration: float):
+    """Connect a client to every simulated doorbell and measure event latency."""
+    loop = asyncio.get_running_loop()
+    doorbells = await start_doorbells(devices, rate)
+    latencies = []
+    ready = []
+    connections = []
+
+    for server, sent in doorbells:
+        port = server.sockets[0].getsockname()[1]
+
+        def on_event(status, sent=sent):
+            if status[LOREX_CONNECTION] and status[LOREX_ID] and sent:
+                latencies.append(time.perf_counter() - sent.popleft())
+
+        def on_ready(status, on_event=on_event):
+            # attach once the device details are loaded, as the coordinator does
+            client = status.get("lorex_Client")
+            if client is not None and not status["lorex_events"]:
+                ready.append(client)
+                client.attach_event_manager()
+            on_event(status)
+
+        config = {
+            "username": USERNAME,
+            "password": PASSWORD,
+            "host": "127.0.0.1",
+            "port": port,
+            "on_event": on_ready,
+        }
+        on_con_lost = loop.create_future()
+        transport, _ = await loop.create_connection(
+            lambda config=config, on_con_lost=on_con_lost: LorexDoorbellClient(
+                config, on_con_lost
+            ),
+            "127.0.0.1",
+            port,
+        )
+        connections.append(transport)
+
+    start = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - start
+    measured = sorted(latencies)
+    count = len(measured)
+
+    # the clients log the closed connections as errors
+    logging.getLogger("lorex").setLevel(logging.CRITICAL)
+    for transport in connections:
+        transport.close()
+    for server, _ in doorbells:
+        server.close()
+
+    print(f"Doorbells: {devices}, connected: {len(ready)}, rate: {rate}/s each")
+    if not measured:
+        print("No events received")
+        return
+    print(f"Events: {count}, sustained: {count / elapsed:.0f} events/s")
+    print(
+        "Latency ms: "
+        + ", ".join(
+            f"p{int(fraction * 100)} {percentile(measured, fraction) * 1000:.3f}"
+            for fraction in (0.5, 0.9, 0.99)
+        )
+        + f", max {measured[-1] * 1000:.3f}"
+    )
+
+
+async def serve(devices: int, rate: float, host: str, port: int):
+    """Serve simulated doorbells until interrupted."""
+    doorbells = await start_doorbells(devices, rate, host, port)
+    for server, _ in doorbells:
+        address = server.sockets[0].getsockname()
+        print(f"Doorbell on {address[0]}:{address[1]}, user {USERNAME}/{PASSWORD}")
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    """Parse arguments and run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=10, help="events/s per device")
+    parser.add_argument("--duration", type=float, default=5, help="seconds to drive")
+    parser.add_argument("--serve", action="store_true", help="only run the doorbells")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.serve:
+        asyncio.run(serve(args.devices, args.rate, args.host, args.port))
+    else:
+        asyncio.run(drive(args.devices, args.rate, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Import the integration's protocol modules without Home Assistant.
+
+The lorex package __init__ imports Home Assistant, the protocol modules do
+not. Registering a bare package for the directory lets the tools import
+lorex.lorex_doorbell_client and friends on their own.
+"""
+
+import importlib.util
+from pathlib import Path
+import sys
+import types
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "lorex"
+
+
+def load_package() -> types.ModuleType:
+    """Register the lorex package without running its __init__."""
+    package = sys.modules.get("lorex")
+    if package is None:
+        package = types.ModuleType("lorex")
+        package.__path__ = [str(PACKAGE_DIR)]
+        package.__package__ = "lorex"
+        sys.modules["lorex"] = package
+    return package
+
+
+def load_integration() -> types.ModuleType:
+    """Run the package __init__ as well, this needs Home Assistant installed."""
+    package = load_package()
+    if not hasattr(package, "LorexCoordinator"):
+        spec = importlib.util.spec_from_file_location(
+            "lorex", PACKAGE_DIR / "__init__.py"
+        )
+        spec.loader.exec_module(package)
+    return package
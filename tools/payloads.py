@@ -0,0 +1,110 @@
+"""Doorbell payloads used by the tools.
+
+These are not captures. They are written in the shape of Dahua RPC traffic,
+with the field names and value types a doorbell sends. GET_CONFIG_DUMP is
+synthetic: a 16 channel Encode table generated by _encode_channel to stand
+in for a large configManager.getConfig reply. Swap in a capture from the
+frame trace (debug logging for custom_components.lorex.lorex_doorbell_client
+.frames) when timing against a specific doorbell matters.
+"""
+
+KEEP_ALIVE_REPLY = {
+    "id": 12,
+    "params": {"timeout": 60},
+    "result": True,
+    "session": 2147483421,
+}
+
+NOTIFY_EVENT_STREAM = {
+    "id": 9,
+    "method": "client.notifyEventStream",
+    "params": {
+        "SID": 513,
+        "eventList": [
+            {
+                "Action": "Start",
+                "Code": "VideoMotion",
+                "Data": {
+                    "Id": [0],
+                    "LocaleTime": "2024-05-12 10:14:32",
+                    "RegionName": ["Region1"],
+                    "SmartMotionEnable": False,
+                    "UTC": 1715508872.0,
+                },
+                "Index": 0,
+                "PhysicalChannel": 0,
+            },
+            {
+                "Action": "Start",
+                "Code": "IntelliFrame",
+                "Data": {
+                    "Action": "Start",
+                    "Class": "Normal",
+                    "LocaleTime": "2024-05-12 10:14:32",
+                    "Object": [{"ObjectType": "Human", "ObjectID": 342}],
+                    "UTC": 1715508872.0,
+                },
+                "Index": 0,
+            },
+        ],
+    },
+    "session": 2147483421,
+}
+
+
+def _encode_channel(channel: int) -> dict:
+    """One channel of an Encode config table."""
+    stream = {
+        "AudioEnable": True,
+        "Video": {
+            "BitRate": 2048,
+            "BitRateControl": "VBR",
+            "Compression": "H.265",
+            "CustomResolutionName": "1080P",
+            "FPS": 25,
+            "GOP": 50,
+            "Height": 1080,
+            "Pack": "DHAV",
+            "Priority": 0,
+            "Profile": "Main",
+            "Quality": 4,
+            "QualityRange": 6,
+            "SVCTLayer": 1,
+            "Width": 1920,
+        },
+        "VideoEnable": True,
+    }
+    return {
+        "Channel": channel,
+        "ExtraFormat": [stream, stream, stream],
+        "MainFormat": [stream, stream, stream, stream],
+        "SnapFormat": [stream, stream, stream],
+    }
+
+
+# synthetic, sized like a large getConfig reply rather than copied from one
+GET_CONFIG_DUMP = {
+    "id": 31,
+    "params": {"table": [_encode_channel(channel) for channel in range(16)]},
+    "result": True,
+    "session": 2147483421,
+}
+
+NOTIFY_EVENT_STOP = {
+    **NOTIFY_EVENT_STREAM,
+    "params": {
+        "SID": 513,
+        "eventList": [
+            {**event, "Action": "Stop", "Data": {**event["Data"], "Action": "Stop"}}
+            for event in NOTIFY_EVENT_STREAM["params"]["eventList"]
+        ],
+    },
+}
+
+KEEP_ALIVE_REQUEST = {
+    "id": 12,
+    "session": 2147483421,
+    "magic": "0x1234",
+    "method": "global.keepAlive",
+    "params": {"timeout": 55, "action": True},
+}